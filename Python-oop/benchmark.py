@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for the OOP patient management system.
+
+Usage:
+    python benchmark.py statistics --rows 1000000 --seed
+    python benchmark.py hydration --objects 100000
+    python benchmark.py memory --objects 1000000
+    python benchmark.py validation --objects 1000000 --workers 8
+
+--seed tops the patients table up to --rows synthetic patients in the
+database configured in .env. Only use it against a scratch database.
+"""
+
+import argparse
+import time
+from collections import Counter
+from typing import Any, Callable, Dict
+
+from db import connection
+
+def seed_patients(rows: int):
+    """Insert synthetic patients until the table holds at least `rows` rows"""
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM patients')
+        existing = cursor.fetchone()[0]
+        missing = rows - existing
+        if missing <= 0:
+            print(f"✅ patients already has {existing} rows")
+            return
+
+        print(f"🌱 Seeding {missing} synthetic patients...")
+        cursor.execute('''
+            INSERT INTO patients (first_name, last_name, date_of_birth, gender, contact_number)
+            SELECT 'Bench',
+                   'Patient',
+                   DATE '1930-01-01' + (random() * 34000)::int,
+                   (ARRAY['Male', 'Female', 'Other'])[1 + g % 3],
+                   '555' || lpad((g % 10000000)::text, 7, '0')
+            FROM generate_series(1, %s) AS g
+        ''', (missing,))
+
+    with connection() as conn:
+        conn.cursor().execute('ANALYZE patients')
+    print("✅ Seeding complete")
+
+def time_call(label: str, func: Callable[[], Any], repeat: int) -> float:
+    """Run func `repeat` times and print the best wall-clock time"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print(f"  {label:<40} best of {repeat}: {best * 1000:10.1f} ms")
+    return best
+
+# Benchmarks
+def legacy_statistics() -> Dict[str, Any]:
+    """Statistics the way they were computed before: every patient as an object"""
+    from models.patient import Patient
+    all_patients = Patient.get_all()
+    adults = [p for p in all_patients if p.is_adult()]
+    minors = [p for p in all_patients if not p.is_adult()]
+    gender_counts = Counter(p.gender.lower() for p in all_patients)
+    ages = [p.get_age() for p in all_patients if p.get_age() is not None]
+    return {
+        'total_patients': len(all_patients),
+        'adults': len(adults),
+        'minors': len(minors),
+        'gender_distribution': dict(gender_counts),
+        'average_age': round(sum(ages) / len(ages), 1) if ages else 0,
+        'age_range': {'min': min(ages) if ages else 0, 'max': max(ages) if ages else 0}
+    }
+
+def bench_statistics(args):
+    """Compare object-based statistics with the single aggregate query"""
+    from services.patient_service import PatientService
+    service = PatientService()
+
+    print("📊 PatientService.get_statistics")
+    legacy = time_call("python objects (get_all + get_age)", legacy_statistics, args.repeat)
+    aggregate = time_call("single aggregate SQL query", service.get_statistics, args.repeat)
+    print(f"  speedup: {legacy / aggregate:.1f}x")
+
+def bench_hydration(args):
+    """Compare validated construction with the trusted row hydration path"""
+    from datetime import date, datetime
+    from models.patient import Patient
+    now = datetime.now()
+    rows = [
+        (i, 'Bench', 'Patient', date(1950 + i % 60, 1 + i % 12, 1 + i % 28), ('Male', 'Female', 'Other')[i % 3],
+         f"555-{i % 10000000:07d}", now, now, f"555{i % 10000000:07d}")
+        for i in range(args.objects)
+    ]
+
+    def validated():
+        return [
+            Patient(id=row[0], first_name=row[1], last_name=row[2], date_of_birth=str(row[3]),
+                    gender=row[4], contact_number=row[5], created_at=row[6], updated_at=row[7])
+            for row in rows
+        ]
+
+    def trusted():
+        return [Patient._create_from_row(row) for row in rows]
+
+    print(f"🧱 Hydrating {len(rows)} patient rows (no database)")
+    slow = time_call("Patient(...) with validation", validated, args.repeat)
+    fast = time_call("Patient._create_from_row (trusted)", trusted, args.repeat)
+    print(f"  speedup: {slow / fast:.1f}x")
+
+def bench_memory(args):
+    """Measure per-instance memory and derived-field cost for hydrated patients"""
+    import gc
+    import tracemalloc
+    from datetime import date, datetime
+    from models.patient import Patient
+    now = datetime.now()
+    rows = [
+        (i, 'Bench', 'Patient', date(1950 + i % 60, 1 + i % 12, 1 + i % 28), ('Male', 'Female', 'Other')[i % 3],
+         f"555-{i % 10000000:07d}", now, now, f"555{i % 10000000:07d}")
+        for i in range(args.objects)
+    ]
+
+    gc.collect()
+    tracemalloc.start()
+    patients = [Patient._create_from_row(row) for row in rows]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    def derived_fields():
+        for patient in patients:
+            patient.get_age()
+            patient.is_adult()
+            patient.get_full_name()
+
+    print(f"🧠 {len(patients)} hydrated patients")
+    print(f"  {'memory per instance':<40} {allocated / len(patients):10.0f} B")
+    time_call("get_age + is_adult + get_full_name", derived_fields, args.repeat)
+
+def bench_validation(args):
+    """Compare single-process and process-pool validation of raw import rows"""
+    from models.batch_validation import validate_in_batches
+    rows = [
+        ('Bench', 'Patient', f"{1950 + i % 60}-{1 + i % 12:02d}-{1 + i % 28:02d}",
+         ('Male', 'Female', 'Other')[i % 3], f"555-{i % 10000000:07d}")
+        for i in range(args.objects)
+    ]
+
+    def validate(workers):
+        return lambda: sum(len(chunk.accepted) for chunk in validate_in_batches(rows, workers=workers))
+
+    print(f"🔎 Validating {len(rows)} raw import rows")
+    serial = time_call("single process", validate(1), args.repeat)
+    pooled = time_call(f"process pool ({args.workers or 'all'} workers)", validate(args.workers), args.repeat)
+    print(f"  speedup: {serial / pooled:.1f}x")
+
+BENCHMARKS = {
+    'statistics': bench_statistics,
+    'hydration': bench_hydration,
+    'memory': bench_memory,
+    'validation': bench_validation,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Patient management performance benchmarks")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS) + ['all'])
+    parser.add_argument('--rows', type=int, default=1_000_000, help="rows to benchmark against")
+    parser.add_argument('--seed', action='store_true', help="insert synthetic rows up to --rows")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per measurement")
+    parser.add_argument('--objects', type=int, default=100_000, help="in-memory objects for model benchmarks")
+    parser.add_argument('--workers', type=int, default=None, help="processes for the validation benchmark")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed_patients(args.rows)
+
+    names = sorted(BENCHMARKS) if args.benchmark == 'all' else [args.benchmark]
+    for name in names:
+        BENCHMARKS[name](args)
+        print()
+
+if __name__ == "__main__":
+    main()
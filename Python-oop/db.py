@@ -1,14 +1,718 @@
 import psycopg2
+import psycopg2.extensions
 import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from itertools import count
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Any, Dict, Iterator, List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_connection():
-    return psycopg2.connect(
+def _connection_params() -> Dict[str, Any]:
+    """Get connection parameters for the primary from the environment"""
+    # A full DSN (URI or key=value string) takes precedence over the DB_* parts
+    primary_dsn = os.getenv("DB_PRIMARY_DSN")
+    if primary_dsn:
+        return {'dsn': primary_dsn}
+    return dict(
         dbname=os.getenv("DB_NAME"),
         user=os.getenv("DB_USER"),
         password=os.getenv("DB_PASSWORD"),
         host=os.getenv("DB_HOST"),
         port=os.getenv("DB_PORT")
-    )
\ No newline at end of file
+    )
+
+def get_connection():
+    """Open a new, unpooled connection (scripts and one-off checks)"""
+    return psycopg2.connect(**_connection_params())
+
+
+class PoolError(Exception):
+    """Raised when the connection pool cannot hand out a connection"""
+
+
+class PoolTimeout(PoolError):
+    """Raised when no connection becomes available before the checkout timeout"""
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """Connection that remembers which statements are prepared on its server session"""
+
+    def __init__(self, *args, **kwargs):
+        """Initialize with an empty prepared-statement map"""
+        super().__init__(*args, **kwargs)
+        # SQL text -> prepared statement name (None: cannot be prepared, run it plainly)
+        self.prepared: Dict[str, Optional[str]] = {}
+
+
+class StatementCache:
+    """
+    Per-connection prepared-statement cache for the model layer's SQL:
+    - Keyed by statement text (the SQL of one query shape, values excluded)
+    - First use on a connection runs PREPARE; later uses run EXECUTE, so
+      Postgres skips parsing and planning for repeated statements
+    - Statements that cannot be prepared fall back to plain execution
+    - Counters for hits, prepares and plain executions; can be switched off
+    """
+
+    # %s placeholders (and %% escapes) in psycopg2 SQL
+    _PLACEHOLDER = re.compile(r'%[s%]')
+
+    def __init__(self, enabled: bool = True, max_per_connection: int = 256):
+        """Initialize the cache settings and counters"""
+        self.enabled = enabled
+        self.max_per_connection = max_per_connection
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'prepares': 0, 'unprepared': 0}
+
+    def execute(self, cursor, sql: str, params: Optional[Any] = None):
+        """Execute `sql` on `cursor`, through a prepared statement when possible"""
+        prepared = getattr(cursor.connection, 'prepared', None)
+        if not self.enabled or prepared is None or cursor.name is not None:
+            return self._execute_plain(cursor, sql, params)
+
+        if sql in prepared:
+            name = prepared[sql]
+            if name is None:
+                return self._execute_plain(cursor, sql, params)
+            self._count('hits')
+        else:
+            if len(prepared) >= self.max_per_connection:
+                return self._execute_plain(cursor, sql, params)
+            name = self._prepare(cursor, sql, f"stmt_{len(prepared) + 1}")
+            prepared[sql] = name
+            if name is None:
+                return self._execute_plain(cursor, sql, params)
+            self._count('prepares')
+
+        args = tuple(params or ())
+        if args:
+            cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(args))})", args)
+        else:
+            cursor.execute(f"EXECUTE {name}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['prepares']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['enabled'] = self.enabled
+        return stats
+
+    # Private helpers
+    def _prepare(self, cursor, sql: str, name: str) -> Optional[str]:
+        """PREPARE a statement; None if Postgres rejects it (e.g. ambiguous parameter types)"""
+        conn = cursor.connection
+        # A savepoint keeps a failed PREPARE from aborting the caller's transaction
+        guarded = not conn.autocommit
+        if guarded:
+            cursor.execute("SAVEPOINT prepare_statement")
+        try:
+            cursor.execute(f"PREPARE {name} AS {self._numbered(sql)}")
+        except psycopg2.Error:
+            if guarded:
+                cursor.execute("ROLLBACK TO SAVEPOINT prepare_statement")
+            return None
+        if guarded:
+            cursor.execute("RELEASE SAVEPOINT prepare_statement")
+        return name
+
+    def _execute_plain(self, cursor, sql: str, params: Optional[Any]):
+        """Run a statement without preparing it"""
+        self._count('unprepared')
+        cursor.execute(sql, params)
+
+    def _count(self, counter: str):
+        """Bump one counter"""
+        with self._lock:
+            self._stats[counter] += 1
+
+    @classmethod
+    def _numbered(cls, sql: str) -> str:
+        """Turn %s placeholders into $1, $2, ... for PREPARE"""
+        numbers = count(1)
+        return cls._PLACEHOLDER.sub(lambda match: '%' if match.group() == '%%' else f"${next(numbers)}", sql)
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of PostgreSQL connections:
+    - Opens connections lazily, never more than max_size at a time
+    - Blocks checkouts for up to `timeout` seconds when the pool is exhausted
+    - Closes connections idle for more than `max_idle` seconds (down to min_size)
+    - Pings connections idle for more than `ping_after` seconds on checkout (a
+      recently returned connection is trusted) and resets their transaction on return
+    - Drops connections inherited from a parent process after fork
+    """
+
+    def __init__(self, min_size: int = 1, max_size: int = 10, timeout: float = 30.0,
+                 max_idle: float = 300.0, pre_ping: bool = True, ping_after: float = 30.0,
+                 **connect_kwargs):
+        """Initialize the pool; no connection is opened until the first checkout"""
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.pre_ping = pre_ping
+        self.ping_after = ping_after
+        # Pooled connections track their prepared statements (see StatementCache)
+        self._connect_kwargs = {'connection_factory': PreparingConnection,
+                                **(connect_kwargs or _connection_params())}
+        self._cond = threading.Condition()
+        self._idle = deque()  # (connection, returned_at) pairs, most recently used on the right
+        self._size = 0
+        self._closed = False
+        self._pid = os.getpid()
+        self._inherited: List[Any] = []
+
+    # Checkout / return
+    def getconn(self, timeout: Optional[float] = None):
+        """Check a connection out of the pool"""
+        wait = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + wait
+        while True:
+            self._check_pid()
+            conn = None
+            stale = []
+            with self._cond:
+                if self._closed:
+                    raise PoolError("Connection pool is closed")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"No database connection available within {wait} seconds")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                else:
+                    # Reserve a slot before connecting outside the lock
+                    self._size += 1
+                # Reap here too, so a pool that goes quiet still shrinks on its next use
+                stale = self._collect_idle()
+            self._close_all(stale)
+
+            if conn is None:
+                try:
+                    return psycopg2.connect(**self._connect_kwargs)
+                except Exception:
+                    self._release_slot()
+                    raise
+
+            # A ping costs three round trips; only pay it for connections that sat idle
+            if not self.pre_ping or time.monotonic() - returned_at < self.ping_after or self._ping(conn):
+                return conn
+            self._discard(conn)
+
+    def putconn(self, conn, discard: bool = False):
+        """Return a connection to the pool, resetting it for the next user"""
+        if self._pid != os.getpid():
+            # Checked out by the parent process; not ours to pool
+            return
+
+        if not discard:
+            discard = not self._reset(conn)
+        if discard:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                stale = [conn]
+            else:
+                self._idle.append((conn, time.monotonic()))
+                stale = self._collect_idle()
+            self._cond.notify()
+        self._close_all(stale)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """Context manager: check out a connection, commit on success, rollback on error"""
+        conn = self.getconn(timeout)
+        with self.lease(conn):
+            yield conn
+
+    @contextmanager
+    def lease(self, conn) -> Iterator[Any]:
+        """Run an already checked-out connection as one transaction, then return it"""
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            # BaseException so abandoned generators (GeneratorExit) still return the connection
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+            self.putconn(conn, discard=bool(conn.closed))
+            raise
+        self.putconn(conn)
+
+    # Maintenance
+    def close(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            stale = [conn for conn, _ in self._idle]
+            self._size -= len(stale)
+            self._idle.clear()
+            self._cond.notify_all()
+        self._close_all(stale)
+
+    def reap_idle(self):
+        """Close connections that have been idle for longer than max_idle"""
+        with self._cond:
+            stale = self._collect_idle()
+        self._close_all(stale)
+
+    def stats(self) -> Dict[str, int]:
+        """Get pool usage counters"""
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size
+            }
+
+    # Private helpers
+    def _collect_idle(self) -> List[Any]:
+        """Pop expired idle connections (oldest first); caller holds the lock"""
+        stale = []
+        cutoff = time.monotonic() - self.max_idle
+        while self._idle and len(self._idle) > self.min_size and self._idle[0][1] < cutoff:
+            conn, _ = self._idle.popleft()
+            stale.append(conn)
+            self._size -= 1
+        return stale
+
+    def _ping(self, conn) -> bool:
+        """Check that a pooled connection is still usable"""
+        if conn.closed:
+            return False
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _reset(self, conn) -> bool:
+        """Roll back any open transaction; return False if the connection is unusable"""
+        if conn.closed:
+            return False
+        try:
+            status = conn.get_transaction_status()
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                return False
+            if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if conn.autocommit:
+                conn.autocommit = False
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        """Close a connection and free its slot"""
+        self._close_all([conn])
+        self._release_slot()
+
+    def _release_slot(self):
+        """Give a reserved slot back and wake one waiter"""
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _check_pid(self):
+        """Forget connections inherited across fork without closing the parent's sockets"""
+        if self._pid == os.getpid():
+            return
+        # Keep references so the inherited sockets are never finalized in the child
+        self._inherited.extend(conn for conn, _ in self._idle)
+        self._idle = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+
+    @staticmethod
+    def _close_all(conns: List[Any]):
+        """Close connections, ignoring errors from already broken ones"""
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+# Process-wide pool used by the model layer and the web apps
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+_inherited_pools: List[ConnectionPool] = []
+
+def _pool_settings() -> Dict[str, Any]:
+    """Get pool sizing and timeouts from the environment"""
+    return dict(
+        min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+        max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        max_idle=float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+        pre_ping=os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+        ping_after=float(os.getenv("DB_POOL_PING_AFTER", "30"))
+    )
+
+def get_pool() -> ConnectionPool:
+    """Get the process-wide connection pool (primary), creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(**_pool_settings())
+    return _pool
+
+
+class Replica:
+    """One read replica: its pool and last known health"""
+
+    def __init__(self, dsn: str, pool: ConnectionPool):
+        """Initialize a replica that has not been checked yet"""
+        self.host = psycopg2.extensions.parse_dsn(dsn).get('host', 'localhost')
+        self.pool = pool
+        self.lag: Optional[float] = None
+        self.checked_at = float('-inf')
+        self.down_until = 0.0
+        self.reads = 0
+        self.failures = 0
+
+
+class ReplicaRouter:
+    """
+    Routes read-only work to streaming replicas:
+    - Round-robin over replicas, each with its own pool
+    - Replication lag is measured on a checked-out connection at most every
+      `check_interval` seconds; replicas lagging more than `max_lag` are skipped
+    - Replicas that fail to connect are skipped for `retry_after` seconds; saturated
+      replica pools are skipped without waiting (only the primary fallback waits)
+    - With no usable replica, reads fall back to the primary
+    """
+
+    # Seconds of WAL not yet replayed (0 when fully caught up, so an idle primary is not "lag")
+    LAG_SQL = (
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    )
+
+    def __init__(self, replica_dsns: List[str], max_lag: float = 5.0, check_interval: float = 5.0,
+                 retry_after: float = 30.0, **pool_settings):
+        """Initialize one lazily connecting pool per replica DSN"""
+        if not replica_dsns:
+            raise ValueError("At least one replica DSN is required")
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.retry_after = retry_after
+        self.replicas = [Replica(dsn, ConnectionPool(dsn=dsn, **pool_settings)) for dsn in replica_dsns]
+        self._next = count()
+        self._lock = threading.Lock()
+        self._fallbacks = 0
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """Context manager: a replica connection as one transaction, or the primary's"""
+        replica, conn = self._checkout()
+        if conn is None:
+            with self._lock:
+                self._fallbacks += 1
+            with get_pool().connection(timeout) as conn:
+                yield conn
+            return
+        with replica.pool.lease(conn):
+            yield conn
+
+    def stats(self) -> Dict[str, Any]:
+        """Get per-replica health and read counters"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'primary_fallbacks': self._fallbacks,
+                'max_lag': self.max_lag,
+                'replicas': [{
+                    'host': replica.host,
+                    'healthy': replica.down_until <= now and (replica.lag or 0) <= self.max_lag,
+                    'lag': replica.lag,
+                    'reads': replica.reads,
+                    'failures': replica.failures,
+                    'pool': replica.pool.stats()
+                } for replica in self.replicas]
+            }
+
+    def close(self):
+        """Close every replica pool"""
+        for replica in self.replicas:
+            replica.pool.close()
+
+    # Private helpers
+    def _checkout(self):
+        """Check out a connection from the next healthy replica without waiting; (None, None) if there is none"""
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            now = time.monotonic()
+            if replica.down_until > now:
+                continue
+            # Known to lag: wait for the next check before trying it again
+            if replica.lag is not None and replica.lag > self.max_lag and now - replica.checked_at < self.check_interval:
+                continue
+            try:
+                # Non-blocking: a saturated replica is skipped instead of stalling the read
+                conn = replica.pool.getconn(0)
+            except PoolTimeout:
+                # Busy, not broken
+                continue
+            except (PoolError, psycopg2.Error):
+                self._mark_down(replica)
+                continue
+            if now - replica.checked_at >= self.check_interval and not self._check_lag(replica, conn, now):
+                continue
+            with self._lock:
+                replica.reads += 1
+            return replica, conn
+        return None, None
+
+    def _check_lag(self, replica: Replica, conn, now: float) -> bool:
+        """Measure replication lag on `conn`; returns it to the pool and False if too far behind"""
+        replica.checked_at = now
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.LAG_SQL)
+            replica.lag = float(cursor.fetchone()[0])
+            cursor.close()
+            conn.rollback()
+        except psycopg2.Error:
+            replica.pool.putconn(conn, discard=True)
+            self._mark_down(replica)
+            return False
+        if replica.lag > self.max_lag:
+            replica.pool.putconn(conn)
+            return False
+        return True
+
+    def _mark_down(self, replica: Replica):
+        """Skip a failing replica for a while"""
+        with self._lock:
+            replica.failures += 1
+            replica.down_until = time.monotonic() + self.retry_after
+
+
+# Replica routing for read_connection() (DB_REPLICA_DSNS unset: every read goes to the primary)
+_router: Optional[ReplicaRouter] = None
+_router_lock = threading.Lock()
+
+def get_router() -> Optional[ReplicaRouter]:
+    """Get the process-wide replica router, or None when no replicas are configured"""
+    global _router
+    replica_dsns = [dsn.strip() for dsn in os.getenv("DB_REPLICA_DSNS", "").split(",") if dsn.strip()]
+    if _router is None and replica_dsns:
+        with _router_lock:
+            if _router is None:
+                _router = ReplicaRouter(
+                    replica_dsns,
+                    max_lag=float(os.getenv("DB_REPLICA_MAX_LAG", "5")),
+                    check_interval=float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5")),
+                    retry_after=float(os.getenv("DB_REPLICA_RETRY_AFTER", "30")),
+                    **_pool_settings()
+                )
+    return _router
+
+def routing_stats() -> Optional[Dict[str, Any]]:
+    """Get replica routing counters (None when no replicas are configured)"""
+    router = get_router()
+    return router.stats() if router is not None else None
+
+# Prepared-statement cache used by the model layer (DB_PREPARE_STATEMENTS=false disables it)
+statement_cache = StatementCache(
+    enabled=os.getenv("DB_PREPARE_STATEMENTS", "true").lower() in ("1", "true", "yes"),
+    max_per_connection=int(os.getenv("DB_PREPARED_MAX", "256"))
+)
+
+def execute(cursor, sql: str, params: Optional[Any] = None):
+    """Execute model SQL through the prepared-statement cache"""
+    statement_cache.execute(cursor, sql, params)
+
+def set_statement_cache(enabled: bool):
+    """Turn the prepared-statement cache on or off"""
+    statement_cache.enabled = enabled
+
+def statement_cache_stats() -> Dict[str, Any]:
+    """Get prepared-statement cache counters"""
+    return statement_cache.stats()
+
+# Connection of the active unit of work (see bind_session); nested connection() calls share it
+_session_connection: ContextVar[Optional[Any]] = ContextVar('session_connection', default=None)
+
+# Set once this context used the primary for writing; its later reads stay on the primary
+_pinned_to_primary: ContextVar[bool] = ContextVar('pinned_to_primary', default=False)
+
+def connection(timeout: Optional[float] = None):
+    """Context manager yielding a pooled primary connection as one transaction (use for writes)"""
+    conn = _session_connection.get()
+    if conn is not None:
+        return _joined(conn)
+    # Read-your-writes: whatever this context reads next must see this transaction
+    if not _pinned_to_primary.get():
+        _pinned_to_primary.set(True)
+    return get_pool().connection(timeout)
+
+def read_connection(timeout: Optional[float] = None):
+    """Context manager for read-only work: a replica connection unless pinned to the primary"""
+    conn = _session_connection.get()
+    if conn is not None:
+        return _joined(conn)
+    router = get_router()
+    if router is None or _pinned_to_primary.get():
+        return get_pool().connection(timeout)
+    return router.connection(timeout)
+
+def primary_read_connection(timeout: Optional[float] = None):
+    """Context manager for reads that fill long-lived caches: always the primary, without pinning"""
+    conn = _session_connection.get()
+    if conn is not None:
+        return _joined(conn)
+    return get_pool().connection(timeout)
+
+def reset_routing():
+    """Unpin this context from the primary (call at the start of each request)"""
+    _pinned_to_primary.set(False)
+
+@contextmanager
+def _joined(conn) -> Iterator[Any]:
+    """Yield the session connection; its owner commits or rolls back"""
+    yield conn
+
+@contextmanager
+def bind_session(conn) -> Iterator[Any]:
+    """Make connection() reuse `conn` (and its open transaction) in this context"""
+    token = _session_connection.set(conn)
+    try:
+        yield conn
+    finally:
+        _session_connection.reset(token)
+
+class CopyCancelled(Exception):
+    """Raised inside a COPY worker when the consumer stopped reading"""
+
+
+class _QueueWriter:
+    """File-like sink for copy_expert that hands buffered chunks to a bounded queue"""
+
+    def __init__(self, chunks: queue.Queue, cancelled: threading.Event, chunk_size: int):
+        """Initialize with the queue shared with the consumer"""
+        self._chunks = chunks
+        self._cancelled = cancelled
+        self._chunk_size = chunk_size
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+
+    def write(self, data) -> int:
+        """Buffer one COPY data message (usually a single row)"""
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self._chunk_size:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        """Hand the buffered bytes to the consumer, waiting while the queue is full"""
+        if self._buffer:
+            put_blocking(self._chunks, b''.join(self._buffer), self._cancelled)
+            self._buffer = []
+            self._buffered = 0
+
+
+def put_blocking(chunks: queue.Queue, item: Any, cancelled: threading.Event):
+    """Put into a bounded queue, giving up once the consumer has gone away"""
+    while True:
+        if cancelled.is_set():
+            raise CopyCancelled("COPY consumer stopped reading")
+        try:
+            chunks.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+def copy_to_iter(sql: str, chunk_size: int = 65536, max_chunks: int = 16) -> Iterator[bytes]:
+    """
+    Run `COPY ... TO STDOUT` on a pooled read connection in a worker thread and yield
+    its output in chunks of about chunk_size bytes. At most max_chunks chunks are
+    buffered, so memory stays constant however large the result is.
+    """
+    chunks: queue.Queue = queue.Queue(maxsize=max_chunks)
+    cancelled = threading.Event()
+    finished = object()
+
+    def produce():
+        try:
+            with read_connection() as conn:
+                writer = _QueueWriter(chunks, cancelled, chunk_size)
+                conn.cursor().copy_expert(sql, writer)
+                writer.flush()
+            result = finished
+        except BaseException as e:
+            result = e
+        try:
+            put_blocking(chunks, result, cancelled)
+        except CopyCancelled:
+            pass
+
+    # The worker inherits this context's primary pin and unit-of-work session
+    worker = threading.Thread(target=copy_context().run, args=(produce,), name='copy-to-stdout', daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is finished:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Stops the worker if the consumer (e.g. an HTTP client) went away early
+        cancelled.set()
+
+def close_pool():
+    """Close the process-wide pools (e.g. on worker shutdown)"""
+    global _pool, _router
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+    with _router_lock:
+        if _router is not None:
+            _router.close()
+            _router = None
+
+def _reset_pool_after_fork():
+    """Start each forked worker (e.g. gunicorn pre-fork) with a fresh pool"""
+    global _pool, _pool_lock, _router_lock
+    if _pool is not None:
+        _inherited_pools.append(_pool)
+    _pool = None
+    _pool_lock = threading.Lock()
+    # Replica pools drop inherited connections themselves; only the locks need replacing
+    _router_lock = threading.Lock()
+    if _router is not None:
+        _router._lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any, Type, Optional
 from models.base_model import BaseModel
 from models.patient import Patient
+from models import validation
+from models.validation import ValidationResult, validate_patient_data
 
 class ModelFactory(ABC):
     """
@@ -49,44 +51,41 @@ class PatientModelFactory(ModelFactory):
         return self._supported_models.copy()
     
     # Factory methods for specific patient types
+    def create_from_validation(self, result: ValidationResult) -> Patient:
+        """Create a patient from an existing validation result without re-validating"""
+        return Patient.from_validated(result)
+    
     def create_adult_patient(self, **kwargs) -> Patient:
         """Create an adult patient (18+)"""
-        # Validate age
-        if 'date_of_birth' in kwargs:
-            temp_patient = Patient(**kwargs)
-            if not temp_patient.is_adult():
-                raise ValueError("Patient must be 18 or older")
-        return self.create_model('patient', **kwargs)
+        # Validate once; the age check reuses the parsed birth date
+        patient = self.create_from_validation(validate_patient_data(kwargs))
+        if not patient.is_adult():
+            raise ValueError("Patient must be 18 or older")
+        return patient
     
     def create_minor_patient(self, **kwargs) -> Patient:
         """Create a minor patient (<18)"""
-        # Validate age
-        if 'date_of_birth' in kwargs:
-            temp_patient = Patient(**kwargs)
-            if temp_patient.is_adult():
-                raise ValueError("Patient must be under 18")
-        return self.create_model('patient', **kwargs)
+        # Validate once; the age check reuses the parsed birth date
+        patient = self.create_from_validation(validate_patient_data(kwargs))
+        if patient.is_adult():
+            raise ValueError("Patient must be under 18")
+        return patient
     
     def create_patient_from_dict(self, data: Dict[str, Any]) -> Patient:
         """Create patient from dictionary data"""
         return self.create_model('patient', **data)
     
     def create_patient_with_validation(self, **kwargs) -> Patient:
-        """Create patient with enhanced validation"""
-        # Additional validation logic
-        if 'contact_number' in kwargs:
-            contact = kwargs['contact_number']
-            if not self._validate_contact_format(contact):
-                raise ValueError("Invalid contact number format")
-        
-        return self.create_model('patient', **kwargs)
+        """Create patient with enhanced validation (every field, reported per field)"""
+        result = validate_patient_data(kwargs)
+        if 'contact_number' in result.errors:
+            raise ValueError("Invalid contact number format")
+        return self.create_from_validation(result)
     
     # Private helper methods
     def _validate_contact_format(self, contact: str) -> bool:
         """Validate contact number format"""
-        import re
-        digits_only = re.sub(r'\D', '', contact)
-        return 7 <= len(digits_only) <= 15
+        return validation.is_valid_contact_digits(validation.normalize_contact(contact))
 
 class ModelFactoryRegistry:
     """
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Online schema migrations for the patients table (generated columns, triggers).
+Run once per database before starting the app (any server: gunicorn, flask, ...):
+
+    python migrations.py
+"""
+
+import os
+from db import get_connection
+from models.change_listener import CHANGE_CHANNEL
+
+# Digits-only copy of contact_number, kept current by a trigger
+CONTACT_DIGITS_FUNCTION = r'''
+    CREATE OR REPLACE FUNCTION set_contact_digits() RETURNS trigger AS $$
+    BEGIN
+        NEW.contact_digits := regexp_replace(NEW.contact_number, '\D', '', 'g');
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+'''
+
+def migrate_contact_digits(batch_size: int = 10000, lock_timeout: str = '5s'):
+    """
+    Add patients.contact_digits without rewriting or long-locking the table:
+    - ADD COLUMN without a default is a catalog-only change (brief lock, bounded by lock_timeout)
+    - A BEFORE INSERT/UPDATE trigger fills it for new writes
+    - Existing rows are backfilled in id ranges, one short transaction per batch
+    - The index is built with CREATE INDEX CONCURRENTLY (writes keep flowing)
+    Safe to re-run; a contact_digits column that is already GENERATED is left as is.
+    """
+    conn = get_connection()
+    try:
+        conn.autocommit = True
+        cursor = conn.cursor()
+        cursor.execute("SET lock_timeout = %s", (lock_timeout,))
+
+        cursor.execute('''
+            SELECT is_generated FROM information_schema.columns
+            WHERE table_name = 'patients' AND column_name = 'contact_digits'
+        ''')
+        existing = cursor.fetchone()
+        if existing is None or existing[0] != 'ALWAYS':
+            cursor.execute('ALTER TABLE patients ADD COLUMN IF NOT EXISTS contact_digits VARCHAR(20)')
+            cursor.execute(CONTACT_DIGITS_FUNCTION)
+            cursor.execute('DROP TRIGGER IF EXISTS patients_contact_digits ON patients')
+            cursor.execute('''
+                CREATE TRIGGER patients_contact_digits
+                BEFORE INSERT OR UPDATE OF contact_number ON patients
+                FOR EACH ROW EXECUTE PROCEDURE set_contact_digits()
+            ''')
+
+            # Backfill rows written before the trigger existed
+            cursor.execute('SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM patients WHERE contact_digits IS NULL')
+            low, high = cursor.fetchone()
+            filled = 0
+            for start in range(low, high + 1, batch_size):
+                cursor.execute(r'''
+                    UPDATE patients SET contact_digits = regexp_replace(contact_number, '\D', '', 'g')
+                    WHERE id >= %s AND id < %s AND contact_digits IS NULL
+                ''', (start, start + batch_size))
+                filled += cursor.rowcount
+            if filled:
+                print(f"  Backfilled contact_digits for {filled} patients")
+
+        cursor.execute("RESET lock_timeout")
+        # A failed concurrent build leaves an INVALID index behind; rebuild it
+        cursor.execute('''
+            SELECT NOT indisvalid FROM pg_index
+            WHERE indexrelid = to_regclass('idx_patients_contact_digits')
+        ''')
+        invalid = cursor.fetchone()
+        if invalid and invalid[0]:
+            cursor.execute('DROP INDEX CONCURRENTLY idx_patients_contact_digits')
+        cursor.execute('CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_patients_contact_digits ON patients (contact_digits)')
+    finally:
+        conn.close()
+
+# Bumps table_versions once per writing transaction (see migrate_table_versions)
+BUMP_TABLE_VERSION_FUNCTION = '''
+    CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+    BEGIN
+        -- Once per transaction: later firings in the same transaction are no-ops
+        IF current_setting('table_versions.' || TG_TABLE_NAME, true) = 'bumped' THEN
+            RETURN NULL;
+        END IF;
+        PERFORM set_config('table_versions.' || TG_TABLE_NAME, 'bumped', true);
+        UPDATE table_versions SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+'''
+
+def migrate_table_versions(lock_timeout: str = '5s'):
+    """
+    Install the table_versions counter behind ETags and its triggers on patients.
+    The bump is a deferred constraint trigger, so writers take the version row lock
+    last and hold it only while committing: no deadlocks with row locks, and the new
+    version becomes visible together with the data. Commits that touch patients still
+    take turns on that one row. Runs in one transaction; safe to re-run.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS table_versions (
+                table_name TEXT PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute("INSERT INTO table_versions (table_name) VALUES ('patients') ON CONFLICT DO NOTHING")
+        cursor.execute(BUMP_TABLE_VERSION_FUNCTION)
+        cursor.execute('DROP TRIGGER IF EXISTS patients_bump_version ON patients')
+        cursor.execute('''
+            CREATE CONSTRAINT TRIGGER patients_bump_version
+            AFTER INSERT OR UPDATE OR DELETE ON patients
+            DEFERRABLE INITIALLY DEFERRED
+            FOR EACH ROW EXECUTE PROCEDURE bump_table_version()
+        ''')
+        # Constraint triggers cannot fire on TRUNCATE, which holds an exclusive lock anyway
+        cursor.execute('DROP TRIGGER IF EXISTS patients_bump_version_truncate ON patients')
+        cursor.execute('''
+            CREATE TRIGGER patients_bump_version_truncate
+            AFTER TRUNCATE ON patients
+            FOR EACH STATEMENT EXECUTE PROCEDURE bump_table_version()
+        ''')
+        conn.commit()
+    finally:
+        conn.close()
+
+# NOTIFY '<table>:<id>' per changed row on channel TG_ARGV[0], or one '<table>:*' for
+# TRUNCATE and for statements changing more than TG_ARGV[1] rows
+NOTIFY_TABLE_CHANGE_FUNCTION = '''
+    CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger AS $$
+    DECLARE
+        changed INTEGER;
+        row_id BIGINT;
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            PERFORM pg_notify(TG_ARGV[0], TG_TABLE_NAME || ':*');
+            RETURN NULL;
+        END IF;
+        SELECT COUNT(*) INTO changed
+        FROM (SELECT 1 FROM changed_rows LIMIT TG_ARGV[1]::int + 1) AS capped;
+        IF changed > TG_ARGV[1]::int THEN
+            PERFORM pg_notify(TG_ARGV[0], TG_TABLE_NAME || ':*');
+        ELSE
+            FOR row_id IN SELECT id FROM changed_rows LOOP
+                PERFORM pg_notify(TG_ARGV[0], TG_TABLE_NAME || ':' || row_id);
+            END LOOP;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+'''
+
+def migrate_change_notify(channel: str = None, max_rows: int = None, lock_timeout: str = '5s'):
+    """
+    Install the statement-level NOTIFY triggers behind cross-worker cache invalidation.
+    Channel and row cap default to CHANGE_CHANNEL and CHANGE_NOTIFY_MAX_ROWS, which must
+    match the app's settings. Runs in one transaction; safe to re-run.
+    """
+    channel = channel or os.getenv('CHANGE_CHANNEL') or CHANGE_CHANNEL
+    if max_rows is None:
+        max_rows = int(os.getenv('CHANGE_NOTIFY_MAX_ROWS', '100'))
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+        cursor.execute(NOTIFY_TABLE_CHANGE_FUNCTION)
+        # One trigger per event: each exposes its transition table as changed_rows
+        cursor.execute('DROP TRIGGER IF EXISTS patients_notify_change ON patients')
+        for event, transition in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            cursor.execute(f'DROP TRIGGER IF EXISTS patients_notify_{event.lower()} ON patients')
+            cursor.execute(f'''
+                CREATE TRIGGER patients_notify_{event.lower()}
+                AFTER {event} ON patients
+                REFERENCING {transition} TABLE AS changed_rows
+                FOR EACH STATEMENT EXECUTE PROCEDURE notify_table_change(%s, %s)
+            ''', (channel, str(max_rows)))
+        cursor.execute('DROP TRIGGER IF EXISTS patients_notify_truncate ON patients')
+        cursor.execute('''
+            CREATE TRIGGER patients_notify_truncate
+            AFTER TRUNCATE ON patients
+            FOR EACH STATEMENT EXECUTE PROCEDURE notify_table_change(%s, %s)
+        ''', (channel, str(max_rows)))
+        conn.commit()
+    finally:
+        conn.close()
+
+def run_migrations():
+    """Apply every migration in order"""
+    print("🔧 Migrating patients.contact_digits...")
+    migrate_contact_digits()
+    print("🔧 Installing table version triggers...")
+    migrate_table_versions()
+    print("🔧 Installing change notification triggers...")
+    migrate_change_notify()
+    print("✅ Migrations applied")
+
+if __name__ == "__main__":
+    try:
+        run_migrations()
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        raise SystemExit(1)
@@ -1,5 +1,12 @@
 # Models package for OOP Patient Management System
 from .base_model import BaseModel
 from .patient import Patient
+from .cache import ModelCache
+from .query import Query
+from .validation import ValidationResult, validate_patient_data
+from .unit_of_work import UnitOfWork
 
-__all__ = ['BaseModel', 'Patient'] 
\ No newline at end of file
+# PatientFrame (models.patient_frame) is imported on demand because it requires NumPy
+
+__all__ = ['BaseModel', 'Patient', 'ModelCache', 'Query', 'ValidationResult', 'validate_patient_data',
+           'UnitOfWork'] 
\ No newline at end of file
@@ -1,8 +1,15 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Union
 import json
-from db import get_connection
+import psycopg2
+from psycopg2.extras import execute_values
+from db import connection, execute, primary_read_connection, read_connection
+from pagination import encode_cursor, decode_cursor
+from models.cache import ModelCache
+from models.query import Query
+from models.unit_of_work import UnitOfWork
+from models.versions import TableVersions
 
 class BaseModel(ABC):
     """
@@ -13,12 +20,41 @@ class BaseModel(ABC):
     - Polymorphism: Different implementations for different model types
     """
     
+    # Slots instead of a per-instance __dict__ keep large result sets compact
+    __slots__ = ('_id', '_created_at', '_updated_at', '_validated', '_dirty')
+    
+    # Shared "nothing changed" marker, so clean instances carry no per-instance set
+    _CLEAN = frozenset()
+    
+    # Columns the database maintains; never written by save() or update_by_id()
+    _read_only_columns: tuple = ('id', 'created_at', 'updated_at')
+    
+    # Table columns in the order _create_from_row expects them
+    _columns: tuple = ('id', 'created_at', 'updated_at')
+    
+    # Keyset pagination orders: name -> sort columns (always ending with the unique id)
+    _page_orders: Dict[str, tuple] = {'id': ('id',)}
+    # Python type of each sort column, for checking decoded cursors
+    _page_key_types: Dict[str, type] = {'id': int}
+    
+    # JSON key -> SQL expression reproducing to_dict(), for the JSON fast path (None: unsupported)
+    _json_fields: Optional[Dict[str, str]] = None
+    
+    # Opt-in identity map shared by all models in this process (see enable_cache)
+    _cache: Optional[ModelCache] = None
+    
+    # Per-table data versions behind ETags (see data_version)
+    _versions = TableVersions()
+    
     def __init__(self, **kwargs):
         """Initialize base model with common attributes"""
         self._id = kwargs.get('id')
         self._created_at = kwargs.get('created_at', datetime.now())
         self._updated_at = kwargs.get('updated_at', datetime.now())
-        self._table_name = self.__class__.__name__.lower() + 's'
+        # Set once the field values are known to be valid; save() then skips re-validating
+        self._validated = False
+        # Columns changed since load/save; None means unknown, so save() writes every column
+        self._dirty = None
     
     # Encapsulation: Private attributes with getters/setters
     @property
@@ -60,130 +96,511 @@ class BaseModel(ABC):
     # Polymorphism: Common methods with different implementations
     def save(self) -> bool:
         """Save model to database"""
-        if not self.validate():
-            raise ValueError("Model validation failed")
+        if not self._validated:
+            if not self.validate():
+                raise ValueError("Model validation failed")
+            self._validated = True
+        
+        unit = UnitOfWork.current()
+        if unit is not None:
+            # Written (batched) when the unit of work flushes
+            unit.register_save(self)
+            return True
         
-        try:
-            conn = get_connection()
+        if self._id is not None:
+            # Update existing record (only the columns changed since load)
+            fields, values = self._get_update_data()
+            if self._dirty is not None:
+                changed = [(field, value) for field, value in zip(fields, values) if field in self._dirty]
+                fields = [field for field, _ in changed]
+                values = [value for _, value in changed]
+            if not fields:
+                # Nothing changed: no checkout, no round trip, no pinning to the primary
+                return True
+        
+        with connection() as conn:
             cursor = conn.cursor()
             
             if self._id is None:
                 # Insert new record
                 fields, values = self._get_insert_data()
                 placeholders = ', '.join(['%s'] * len(fields))
-                query = f"INSERT INTO {self._table_name} ({', '.join(fields)}) VALUES ({placeholders}) RETURNING id, created_at, updated_at"
+                query = f"INSERT INTO {self._get_table_name()} ({', '.join(fields)}) VALUES ({placeholders}) RETURNING id, created_at, updated_at"
                 
-                cursor.execute(query, values)
+                execute(cursor, query, values)
                 result = cursor.fetchone()
                 self._id = result[0]
                 self._created_at = result[1]
                 self._updated_at = result[2]
             else:
-                # Update existing record
-                fields, values = self._get_update_data()
-                if fields:
-                    set_clause = ', '.join([f"{field} = %s" for field in fields])
-                    values.append(self._id)
-                    query = f"UPDATE {self._table_name} SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE id = %s RETURNING updated_at"
-                    
-                    cursor.execute(query, values)
-                    result = cursor.fetchone()
-                    self._updated_at = result[0]
-            
-            conn.commit()
-            return True
-            
-        except Exception as e:
-            if conn:
-                conn.rollback()
-            raise e
-        finally:
-            if conn:
-                conn.close()
+                set_clause = ', '.join([f"{field} = %s" for field in fields])
+                values.append(self._id)
+                query = f"UPDATE {self._get_table_name()} SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE id = %s RETURNING updated_at"
+                
+                execute(cursor, query, values)
+                result = cursor.fetchone()
+                self._updated_at = result[0]
+        
+        self._dirty = self._CLEAN
+        self._invalidate_cached(self._id)
+        self._table_changed()
+        return True
+    
+    @property
+    def dirty_fields(self) -> Optional[frozenset]:
+        """Columns changed since load/save (None when unknown)"""
+        return self._dirty
+    
+    def _mark_dirty(self, field: str):
+        """Record that a column changed and must be written by the next save()"""
+        if self._dirty is not None:
+            self._dirty = self._dirty | {field}
     
     def delete(self) -> bool:
         """Delete model from database"""
+        unit = UnitOfWork.current()
+        if unit is not None:
+            # Removed (batched) when the unit of work flushes
+            return unit.register_delete(self)
+        
         if self._id is None:
             return False
         
-        try:
-            conn = get_connection()
+        with connection() as conn:
             cursor = conn.cursor()
-            
-            cursor.execute(f"DELETE FROM {self._table_name} WHERE id = %s", (self._id,))
+            execute(cursor, f"DELETE FROM {self._get_table_name()} WHERE id = %s", (self._id,))
             deleted = cursor.rowcount > 0
-            conn.commit()
-            
-            if deleted:
-                self._id = None
-            
-            return deleted
-            
-        except Exception as e:
-            if conn:
-                conn.rollback()
-            raise e
-        finally:
-            if conn:
-                conn.close()
+        
+        if deleted:
+            self._invalidate_cached(self._id)
+            self._table_changed()
+            self._id = None
+        
+        return deleted
     
     # Class methods for database operations
     @classmethod
-    def get_by_id(cls, model_id: int) -> Optional['BaseModel']:
-        """Get model by ID"""
-        try:
-            conn = get_connection()
+    def query(cls) -> Query:
+        """Start a composable query over this model's table"""
+        return Query(cls)
+    
+    @classmethod
+    def get_by_id(cls, model_id: int, use_cache: bool = True) -> Optional['BaseModel']:
+        """Get model by ID (read through the identity map when enabled)"""
+        cache = BaseModel._cache if use_cache else None
+        if cache is not None:
+            instance = cache.get(cls, model_id)
+            if instance is not None:
+                return instance
+        
+        # The identity map outlives the request: fill it from the primary, never a lagging replica
+        with (primary_read_connection() if cache is not None else read_connection()) as conn:
             cursor = conn.cursor()
             
-            table_name = cls.__name__.lower() + 's'
-            cursor.execute(f"SELECT * FROM {table_name} WHERE id = %s", (model_id,))
+            table_name = cls._get_table_name()
+            execute(cursor, f"SELECT {cls._select_list()} FROM {table_name} WHERE id = %s", (model_id,))
             row = cursor.fetchone()
-            
-            if row:
-                return cls._create_from_row(row)
-            return None
-            
-        except Exception as e:
-            raise e
-        finally:
-            if conn:
-                conn.close()
+        
+        if row:
+            instance = cls._create_from_row(row)
+            if cache is not None:
+                cache.put(cls, instance.id, instance)
+            return instance
+        return None
+    
+    @classmethod
+    def get_many(cls, model_ids: List[int], chunk_size: int = 10000,
+                 use_cache: bool = True) -> tuple[List['BaseModel'], List[int]]:
+        """
+        Get models for many IDs with one query per chunk of IDs.
+        Returns (models in requested order, requested IDs that do not exist).
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        
+        cache = BaseModel._cache if use_cache else None
+        found: Dict[int, 'BaseModel'] = {}
+        to_load = []
+        for model_id in dict.fromkeys(model_ids):
+            instance = cache.get(cls, model_id) if cache is not None else None
+            if instance is not None:
+                found[model_id] = instance
+            else:
+                to_load.append(model_id)
+        
+        if to_load:
+            query = f"SELECT {cls._select_list()} FROM {cls._get_table_name()} WHERE id = ANY(%s)"
+            with (primary_read_connection() if cache is not None else read_connection()) as conn:
+                cursor = conn.cursor()
+                for start in range(0, len(to_load), chunk_size):
+                    execute(cursor, query, (to_load[start:start + chunk_size],))
+                    for row in cursor.fetchall():
+                        instance = cls._create_from_row(row)
+                        found[instance.id] = instance
+                        if cache is not None:
+                            cache.put(cls, instance.id, instance)
+        
+        models = [found[model_id] for model_id in model_ids if model_id in found]
+        missing = [model_id for model_id in dict.fromkeys(model_ids) if model_id not in found]
+        return models, missing
     
     @classmethod
     def get_all(cls) -> List['BaseModel']:
         """Get all models"""
-        try:
-            conn = get_connection()
+        with read_connection() as conn:
             cursor = conn.cursor()
             
-            table_name = cls.__name__.lower() + 's'
-            cursor.execute(f"SELECT * FROM {table_name} ORDER BY id")
+            table_name = cls._get_table_name()
+            execute(cursor, f"SELECT {cls._select_list()} FROM {table_name} ORDER BY id")
             rows = cursor.fetchall()
+        
+        return [cls._create_from_row(row) for row in rows]
+    
+    @classmethod
+    def iter_all(cls, batch_size: int = 2000) -> Iterator['BaseModel']:
+        """Stream all models in ID order through a server-side cursor, batch_size rows at a time"""
+        table_name = cls._get_table_name()
+        with read_connection() as conn:
+            # Named cursors live on the server; only one batch is held in memory
+            cursor = conn.cursor(name=f"{table_name}_iter_all")
+            cursor.itersize = batch_size
+            execute(cursor, f"SELECT {cls._select_list()} FROM {table_name} ORDER BY id")
             
-            return [cls._create_from_row(row) for row in rows]
-            
-        except Exception as e:
-            raise e
-        finally:
-            if conn:
-                conn.close()
+            for row in cursor:
+                yield cls._create_from_row(row)
+            cursor.close()
+    
+    @classmethod
+    def update_by_id(cls, model_id: int, changes: Dict[str, Any],
+                     validated: bool = False) -> Optional['BaseModel']:
+        """
+        Read-modify-write in one UPDATE ... RETURNING statement.
+        Unknown and read-only keys are ignored; values are checked by _prepare_update
+        unless the caller already validated them. Returns None if the row does not exist.
+        """
+        columns = cls._prepare_update(changes, validated)
+        if not columns:
+            return cls.get_by_id(model_id, use_cache=False)
+        
+        set_clause = ', '.join(f"{column} = %s" for column in columns)
+        names = ', '.join(columns)
+        placeholders = ', '.join(['%s'] * len(columns))
+        values = list(columns.values())
+        with connection() as conn:
+            cursor = conn.cursor()
+            # Rows whose values already match are left alone (no new row version)
+            execute(
+                cursor,
+                f"UPDATE {cls._get_table_name()} SET {set_clause}, updated_at = CURRENT_TIMESTAMP "
+                f"WHERE id = %s AND ({names}) IS DISTINCT FROM ({placeholders}) "
+                f"RETURNING {cls._select_list()}",
+                [*values, model_id, *values]
+            )
+            row = cursor.fetchone()
+        
+        if row is None:
+            # Either missing or unchanged
+            return cls.get_by_id(model_id, use_cache=False)
+        cls._invalidate_cached(model_id)
+        cls._table_changed()
+        return cls._create_from_row(row)
+    
+    @classmethod
+    def _prepare_update(cls, changes: Dict[str, Any], validated: bool = False) -> Dict[str, Any]:
+        """Keep the writable columns of an update; subclasses validate the values"""
+        return {
+            column: value for column, value in changes.items()
+            if column in cls._columns and column not in cls._read_only_columns
+        }
+    
+    @classmethod
+    def page(cls, after: Union[int, str, None] = None, limit: int = 50,
+             order: str = 'id', as_json: bool = False) -> tuple[List[Any], Optional[str]]:
+        """
+        Get one page of models using keyset pagination.
+        `after` is the next_cursor of the previous page (or a plain ID for the
+        'id' order); returns (models, next_cursor) with next_cursor None on the last page.
+        With as_json the page holds to_dict() JSON text rendered by Postgres instead of models.
+        """
+        if order not in cls._page_orders:
+            raise ValueError(f"Unsupported order: {order}")
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        
+        key_columns = cls._page_orders[order]
+        if after is None:
+            key = None
+        elif isinstance(after, int) and key_columns == ('id',):
+            key = [after]
+        elif isinstance(after, str):
+            key = decode_cursor(after, order)
+            if len(key) != len(key_columns):
+                raise ValueError("Invalid cursor")
+            # A well-formed cursor with wrong value types would otherwise fail in Postgres (500, not 400)
+            if any(type(value) is not cls._page_key_types[column] for value, column in zip(key, key_columns)):
+                raise ValueError("Invalid cursor")
+        else:
+            raise ValueError("Invalid cursor")
+        
+        columns = ', '.join(key_columns)
+        where_clause = ''
+        params: List[Any] = []
+        if key is not None:
+            # Row comparison lets Postgres seek straight into the matching index
+            where_clause = f"WHERE ({columns}) > ({', '.join(['%s'] * len(key_columns))})"
+            params.extend(key)
+        params.append(limit + 1)
+        
+        # JSON pages carry the key columns alongside the rendered row for the next cursor
+        select_list = f"{cls._json_select()}, {columns}" if as_json else cls._select_list()
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            execute(
+                cursor,
+                f"SELECT {select_list} FROM {cls._get_table_name()} {where_clause} ORDER BY {columns} LIMIT %s",
+                params
+            )
+            rows = cursor.fetchall()
+        
+        next_cursor = None
+        if as_json:
+            items = [row[0] for row in rows[:limit]]
+            if len(rows) > limit:
+                next_cursor = encode_cursor(order, list(rows[limit - 1][1:]))
+            return items, next_cursor
+        
+        models = [cls._create_from_row(row) for row in rows[:limit]]
+        if len(rows) > limit:
+            last = models[-1]
+            next_cursor = encode_cursor(order, [getattr(last, column) for column in key_columns])
+        return models, next_cursor
     
     @classmethod
     def count(cls) -> int:
         """Count total number of models"""
-        try:
-            conn = get_connection()
+        with read_connection() as conn:
             cursor = conn.cursor()
             
-            table_name = cls.__name__.lower() + 's'
-            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+            table_name = cls._get_table_name()
+            execute(cursor, f"SELECT COUNT(*) FROM {table_name}")
             return cursor.fetchone()[0]
-            
-        except Exception as e:
-            raise e
-        finally:
-            if conn:
-                conn.close()
+    
+    @classmethod
+    def bulk_insert(cls, instances: List['BaseModel'], chunk_size: int = 1000) -> List[tuple[int, Exception]]:
+        """
+        Insert new instances with multi-row INSERTs inside one transaction.
+        Each chunk runs under a savepoint; a failing chunk is retried row by row
+        so only the offending rows are skipped. Returns (index, error) pairs.
+        """
+        if not instances:
+            return []
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        
+        fields, _ = instances[0]._get_insert_data()
+        query = f"INSERT INTO {cls._get_table_name()} ({', '.join(fields)}) VALUES %s RETURNING id, created_at, updated_at"
+        results: Dict[int, tuple] = {}
+        failures: List[tuple[int, Exception]] = []
+        
+        with connection() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(instances), chunk_size):
+                rows = [instance._get_insert_data()[1] for instance in instances[start:start + chunk_size]]
+                cursor.execute("SAVEPOINT bulk_chunk")
+                try:
+                    returned = execute_values(cursor, query, rows, page_size=len(rows), fetch=True)
+                    cursor.execute("RELEASE SAVEPOINT bulk_chunk")
+                    results.update((start + offset, result) for offset, result in enumerate(returned))
+                    continue
+                except psycopg2.Error:
+                    cursor.execute("ROLLBACK TO SAVEPOINT bulk_chunk")
+                
+                # Isolate the rows that made the chunk fail
+                for offset, row in enumerate(rows):
+                    cursor.execute("SAVEPOINT bulk_row")
+                    try:
+                        results[start + offset] = execute_values(cursor, query, [row], fetch=True)[0]
+                        cursor.execute("RELEASE SAVEPOINT bulk_row")
+                    except psycopg2.Error as e:
+                        cursor.execute("ROLLBACK TO SAVEPOINT bulk_row")
+                        failures.append((start + offset, e))
+        
+        # Only apply generated values once the transaction has committed
+        for index, result in results.items():
+            instance = instances[index]
+            instance._id, instance._created_at, instance._updated_at = result
+            instance._dirty = cls._CLEAN
+        if results:
+            cls._table_changed()
+        
+        return failures
+    
+    @classmethod
+    def bulk_update(cls, instances: List['BaseModel'], chunk_size: int = 1000) -> int:
+        """
+        Write the changed columns of many saved instances with one
+        UPDATE ... FROM (VALUES ...) per chunk of instances sharing the same changed columns.
+        Instances are validated first (unless already validated); returns the rows updated.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        
+        # changed columns -> id -> row; a row repeated in one VALUES list would be updated only once
+        groups: Dict[tuple, Dict[int, tuple]] = {}
+        for instance in instances:
+            if instance._id is None:
+                raise ValueError("bulk_update needs saved instances")
+            if not instance._validated:
+                if not instance.validate():
+                    raise ValueError("Model validation failed")
+                instance._validated = True
+            fields, values = instance._get_update_data()
+            changed = [(field, value) for field, value in zip(fields, values)
+                       if instance._dirty is None or field in instance._dirty]
+            if changed:
+                columns = tuple(field for field, _ in changed)
+                groups.setdefault(columns, {})[instance._id] = (instance._id, *(value for _, value in changed))
+        if not groups:
+            return 0
+        
+        table_name = cls._get_table_name()
+        updated: Dict[int, datetime] = {}
+        with connection() as conn:
+            cursor = conn.cursor()
+            types = cls._column_types(cursor)
+            for columns, rows_by_id in groups.items():
+                rows = list(rows_by_id.values())
+                set_clause = ', '.join(f"{column} = v.{column}" for column in columns)
+                # VALUES literals would otherwise be typed text; cast each to its column's type
+                template = '(' + ', '.join(f"%s::{types[column]}" for column in ('id',) + columns) + ')'
+                query = (f"UPDATE {table_name} AS t SET {set_clause}, updated_at = CURRENT_TIMESTAMP "
+                         f"FROM (VALUES %s) AS v (id, {', '.join(columns)}) "
+                         f"WHERE t.id = v.id RETURNING t.id, t.updated_at")
+                for start in range(0, len(rows), chunk_size):
+                    chunk = rows[start:start + chunk_size]
+                    returned = execute_values(cursor, query, chunk, template=template,
+                                              page_size=len(chunk), fetch=True)
+                    updated.update(returned)
+        
+        # Only apply results once the transaction has committed
+        for instance in instances:
+            if instance._id in updated:
+                instance._updated_at = updated[instance._id]
+                instance._dirty = cls._CLEAN
+                cls._invalidate_cached(instance._id)
+        if updated:
+            cls._table_changed()
+        return len(updated)
+    
+    @classmethod
+    def delete_many(cls, model_ids: List[int], chunk_size: int = 10000) -> List[int]:
+        """Delete models by ID with set-based DELETEs; return the IDs actually removed"""
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        
+        unique_ids = list(dict.fromkeys(model_ids))
+        if not unique_ids:
+            return []
+        
+        deleted_ids = []
+        with connection() as conn:
+            cursor = conn.cursor()
+            query = f"DELETE FROM {cls._get_table_name()} WHERE id = ANY(%s) RETURNING id"
+            for start in range(0, len(unique_ids), chunk_size):
+                execute(cursor, query, (unique_ids[start:start + chunk_size],))
+                deleted_ids.extend(row[0] for row in cursor.fetchall())
+        
+        for model_id in deleted_ids:
+            cls._invalidate_cached(model_id)
+        if deleted_ids:
+            cls._table_changed()
+        return deleted_ids
+    
+    # Identity map management
+    @classmethod
+    def enable_cache(cls, max_size: int = 1024, ttl: Optional[float] = 60.0) -> ModelCache:
+        """
+        Turn on the per-process identity map used by get_by_id.
+        Cached instances are shared between callers; fetch with use_cache=False
+        before mutating an instance you do not intend to save.
+        """
+        BaseModel._cache = ModelCache(max_size=max_size, ttl=ttl)
+        return BaseModel._cache
+    
+    @classmethod
+    def disable_cache(cls):
+        """Turn off the identity map and drop its contents"""
+        BaseModel._cache = None
+    
+    @classmethod
+    def cache_stats(cls) -> Optional[Dict[str, Any]]:
+        """Get identity map counters, or None when caching is disabled"""
+        cache = BaseModel._cache
+        return cache.stats() if cache is not None else None
+    
+    @classmethod
+    def _invalidate_cached(cls, model_id: Optional[int]):
+        """Drop a cached instance after it was written or deleted"""
+        cache = BaseModel._cache
+        if cache is not None and model_id is not None:
+            cache.invalidate(cls, model_id)
+    
+    # Data versions (conditional GETs)
+    @classmethod
+    def data_version(cls) -> Optional[str]:
+        """Get a token that changes whenever this model's table changes (None if unknown)"""
+        return BaseModel._versions.version(cls._get_table_name())
+    
+    @classmethod
+    def data_versions(cls) -> TableVersions:
+        """Get the shared version tracker (e.g. to tune refresh_interval)"""
+        return BaseModel._versions
+    
+    @classmethod
+    def _table_changed(cls):
+        """Re-read the table's version after this process wrote to it"""
+        BaseModel._versions.bump(cls._get_table_name())
+    
+    @classmethod
+    def _column_types(cls, cursor) -> Dict[str, str]:
+        """Get column -> SQL type name for this model's table (read once per process)"""
+        types = cls.__dict__.get('_sql_types')
+        if types is None:
+            # Unsized type names: an explicit cast to varchar(n) would silently truncate
+            execute(cursor, """
+                SELECT attname, format_type(atttypid, NULL) FROM pg_attribute
+                WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+            """, (cls._get_table_name(),))
+            types = dict(cursor.fetchall())
+            cls._sql_types = types
+        return types
+    
+    @classmethod
+    def _get_table_name(cls) -> str:
+        """Get the database table backing this model"""
+        return cls.__name__.lower() + 's'
+    
+    @classmethod
+    def _select_list(cls) -> str:
+        """Get the explicit column list used by SELECT statements"""
+        return ', '.join(cls._columns)
+    
+    @staticmethod
+    def _timestamp_text(column: str) -> str:
+        """SQL rendering a timestamp column like str(datetime) (fraction only when non-zero, all six digits)"""
+        # ::text would trim trailing zeros ('09:30:00.5' where Python prints '09:30:00.500000')
+        return (f"CASE WHEN date_trunc('second', {column}) = {column} "
+                f"THEN to_char({column}, 'YYYY-MM-DD HH24:MI:SS') "
+                f"ELSE to_char({column}, 'YYYY-MM-DD HH24:MI:SS.US') END")
+    
+    @classmethod
+    def _json_select(cls) -> str:
+        """Get the SQL expression that renders one row as to_dict() JSON text"""
+        if not cls._json_fields:
+            raise NotImplementedError(f"{cls.__name__} has no JSON projection")
+        pairs = ', '.join(f"'{key}', {expression}" for key, expression in cls._json_fields.items())
+        # ::text so the driver hands the JSON over as a string instead of parsing it
+        return f"json_build_object({pairs})::text"
     
     # Abstract methods that must be implemented by subclasses
     @abstractmethod
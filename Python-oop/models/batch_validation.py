@@ -0,0 +1,88 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import os
+from models.validation import PATIENT_FIELDS, ValidationResult, validate_patient_data
+
+class RowReject(NamedTuple):
+    """One failed check of one input row"""
+    row_number: int
+    field: str
+    reason: str
+
+# Accepted row as it crosses the process boundary:
+# (row number, field values in PATIENT_FIELDS order, birth date ordinal, contact digits)
+AcceptedRow = Tuple[int, Tuple[Any, ...], int, str]
+
+class ValidatedChunk(NamedTuple):
+    """Validation outcome for one chunk of input rows (plain tuples, cheap to unpickle)"""
+    accepted: List[AcceptedRow]
+    rejects: List[RowReject]
+
+    def results(self) -> Iterator[Tuple[int, ValidationResult]]:
+        """Rebuild (row number, ValidationResult) pairs for the accepted rows"""
+        for row_number, values, birth_ordinal, contact_digits in self.accepted:
+            yield row_number, ValidationResult(dict(zip(PATIENT_FIELDS, values)), {},
+                                               date.fromordinal(birth_ordinal), contact_digits)
+
+def validate_in_batches(rows: Iterable[Any], chunk_size: int = 5000, workers: Optional[int] = None,
+                        start_row: int = 1, today: Optional[date] = None) -> Iterator[ValidatedChunk]:
+    """
+    Validate raw patient rows (mappings, or sequences in PATIENT_FIELDS order) across a process pool.
+    Chunks are yielded in input order; at most two chunks per worker are in flight, so memory
+    stays bounded however long the input is. workers=1 validates in this process.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    workers = workers or os.cpu_count() or 1
+    # Every worker judges "not in the future" against the same day
+    today = today or date.today()
+    chunks = _chunked(rows, chunk_size, start_row)
+
+    if workers == 1:
+        for first_row, chunk in chunks:
+            yield _validate_chunk(first_row, chunk, today)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        try:
+            for first_row, chunk in chunks:
+                pending.append(pool.submit(_validate_chunk, first_row, chunk, today))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Abandoned early: drop chunks that have not started yet
+            for future in pending:
+                future.cancel()
+
+def _chunked(rows: Iterable[Any], chunk_size: int, start_row: int) -> Iterator[Tuple[int, List[Any]]]:
+    """Split rows into (first row number, rows) chunks without materializing the input"""
+    iterator = iter(rows)
+    first_row = start_row
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield first_row, chunk
+        first_row += len(chunk)
+
+def _validate_chunk(first_row: int, rows: List[Any], today: date) -> ValidatedChunk:
+    """Validate one chunk (runs inside a worker process)"""
+    accepted = []
+    rejects = []
+    for row_number, row in enumerate(rows, first_row):
+        if not hasattr(row, 'get'):
+            row = dict(zip(PATIENT_FIELDS, row))
+        result = validate_patient_data(row, today)
+        if result.is_valid:
+            data = result.data
+            accepted.append((row_number, tuple([data[field] for field in PATIENT_FIELDS]),
+                             result.birth_date.toordinal(), result.contact_digits))
+        else:
+            rejects.extend(RowReject(row_number, field, reason) for field, reason in result.errors.items())
+    return ValidatedChunk(accepted, rejects)
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+class ModelCache:
+    """
+    Per-process identity map with LRU eviction:
+    - Keys are (model class, id) pairs, so each row maps to one shared instance
+    - Entries expire after `ttl` seconds and the least recently used entry
+      is evicted once `max_size` is reached
+    - Thread-safe; keeps hit/miss/eviction counters for monitoring
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 60.0):
+        """Initialize an empty cache"""
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: 'OrderedDict[tuple, tuple[Any, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, model_class: type, model_id: Hashable) -> Optional[Any]:
+        """Get a cached instance, or None on a miss or expired entry"""
+        key = (model_class, model_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            instance, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return instance
+
+    def put(self, model_class: type, model_id: Hashable, instance: Any):
+        """Store an instance, evicting the least recently used entry if full"""
+        expires_at = time.monotonic() + self._ttl if self._ttl is not None else float('inf')
+        key = (model_class, model_id)
+        with self._lock:
+            self._entries[key] = (instance, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, model_class: type, model_id: Hashable):
+        """Drop one cached instance"""
+        with self._lock:
+            self._entries.pop((model_class, model_id), None)
+
+    def invalidate_model(self, model_class: type):
+        """Drop every cached instance of a model class"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] is model_class]:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop every cached instance"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_size': self._max_size,
+                'ttl': self._ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0
+            }
+
+    def __len__(self) -> int:
+        """Number of cached instances"""
+        return len(self._entries)
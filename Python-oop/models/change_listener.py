@@ -0,0 +1,180 @@
+import os
+import select
+import threading
+from typing import Any, Callable, Dict, List, Optional
+import psycopg2
+import psycopg2.extensions
+from db import get_connection
+from models.base_model import BaseModel
+
+# Default channel used by the notify_table_change() trigger (see migrations.py)
+CHANGE_CHANNEL = 'table_changes'
+
+class ChangeListener:
+    """
+    Background LISTEN/NOTIFY consumer keeping per-process caches coherent across workers:
+    - Table triggers NOTIFY '<table>:<id>' per changed row, or '<table>:*' for TRUNCATE
+      and for statements changing many rows
+    - Each notification drops the matching identity-map entry and the table's
+      cached data version, then calls the table's subscribers (whole-table caches)
+    - Uses its own unpooled connection; reconnects with exponential backoff and
+      invalidates everything afterwards, because notifications sent while
+      disconnected are lost
+    - On every connect, checks which tables have notify triggers on this channel and
+      warns about cached tables that have none (migrations not applied, other channel)
+    """
+
+    def __init__(self, channel: str = CHANGE_CHANNEL, poll_timeout: float = 5.0, max_backoff: float = 30.0):
+        """Initialize a stopped listener"""
+        self.channel = channel
+        self.poll_timeout = poll_timeout
+        self.max_backoff = max_backoff
+        self._subscribers: Dict[str, List[Callable[[str, Optional[int]], Any]]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stats = {'notifications': 0, 'reconnects': 0, 'errors': 0}
+        self._notifying: Optional[List[str]] = None
+        self._missing: List[str] = []
+
+    def subscribe(self, table_name: str, callback: Callable[[str, Optional[int]], Any]):
+        """Call callback(table_name, model_id) on every change (model_id None: whole table)"""
+        self._subscribers.setdefault(table_name, []).append(callback)
+
+    def start(self) -> 'ChangeListener':
+        """Start the listener thread once per process (safe to call on every request)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return self
+            # Threads do not survive fork; each worker starts its own
+            self._stop = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='change-listener', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the listener thread"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get listener counters"""
+        stats = dict(self._stats)
+        stats['running'] = self._thread is not None and self._thread.is_alive()
+        stats['channel'] = self.channel
+        stats['notifying_tables'] = self._notifying
+        stats['missing_triggers'] = list(self._missing)
+        return stats
+
+    # Private helpers
+    def _run(self):
+        """Listen until stopped, reconnecting after connection failures"""
+        backoff = 1.0
+        first = True
+        while not self._stop.is_set():
+            try:
+                conn = get_connection()
+            except psycopg2.Error:
+                self._stats['errors'] += 1
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            try:
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                conn.cursor().execute(f'LISTEN "{self.channel}"')
+                self._check_triggers(conn)
+                if not first:
+                    self._stats['reconnects'] += 1
+                    self._invalidate_all()
+                first = False
+                backoff = 1.0
+                self._listen(conn)
+            except (psycopg2.Error, OSError, ValueError):
+                self._stats['errors'] += 1
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+    def _check_triggers(self, conn):
+        """Record which tables notify this channel; warn about cached tables that do not"""
+        cursor = conn.cursor()
+        # tgargs holds the NUL-terminated trigger arguments; the first is the channel
+        cursor.execute('''
+            SELECT DISTINCT t.tgrelid::regclass::text
+            FROM pg_trigger t JOIN pg_proc p ON p.oid = t.tgfoid
+            WHERE p.proname = 'notify_table_change'
+              AND t.tgenabled <> 'D'
+              AND position(convert_to(%s, 'UTF8') || '\\x00'::bytea IN t.tgargs) = 1
+        ''', (self.channel,))
+        self._notifying = sorted(row[0] for row in cursor.fetchall())
+        expected = set(self._subscribers)
+        expected.update(model_class._get_table_name() for model_class in self._model_classes(None))
+        missing = sorted(expected.difference(self._notifying))
+        if missing and missing != self._missing:
+            print(f"⚠️ No change notify triggers on {', '.join(missing)} for channel "
+                  f"'{self.channel}'; other workers' writes will not invalidate caches "
+                  f"(run python migrations.py)")
+        self._missing = missing
+
+    def _listen(self, conn):
+        """Consume notifications on one connection until it breaks or the listener stops"""
+        while not self._stop.is_set():
+            if select.select([conn], [], [], self.poll_timeout) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                self._stats['notifications'] += 1
+                self._dispatch(notify.payload)
+
+    def _dispatch(self, payload: str):
+        """Invalidate caches for one '<table>:<id>' or '<table>:*' payload"""
+        table_name, _, key = payload.partition(':')
+        model_id = int(key) if key.isdigit() else None
+        cache = BaseModel._cache
+        for model_class in self._model_classes(table_name):
+            if cache is not None:
+                if model_id is None:
+                    cache.invalidate_model(model_class)
+                else:
+                    cache.invalidate(model_class, model_id)
+        BaseModel.data_versions().mark_stale(table_name)
+        for callback in self._subscribers.get(table_name, []):
+            try:
+                callback(table_name, model_id)
+            except Exception:
+                self._stats['errors'] += 1
+
+    def _invalidate_all(self):
+        """Drop everything that changes could have made stale while disconnected"""
+        cache = BaseModel._cache
+        if cache is not None:
+            cache.clear()
+        BaseModel.data_versions().reset()
+        for table_name, callbacks in self._subscribers.items():
+            for callback in callbacks:
+                try:
+                    callback(table_name, None)
+                except Exception:
+                    self._stats['errors'] += 1
+
+    @staticmethod
+    def _model_classes(table_name: Optional[str]) -> List[type]:
+        """Find the concrete model classes stored in a table (None: in any table)"""
+        found = []
+        pending = list(BaseModel.__subclasses__())
+        while pending:
+            model_class = pending.pop()
+            pending.extend(model_class.__subclasses__())
+            if table_name is None or model_class._get_table_name() == table_name:
+                found.append(model_class)
+        return found
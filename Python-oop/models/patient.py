@@ -1,7 +1,14 @@
 from datetime import datetime, date
 from typing import Dict, List, Any, Optional
-import re
+from psycopg2 import errors as pg_errors
+from db import execute, read_connection
 from models.base_model import BaseModel
+from models.query import Query, escape_like
+from models import validation
+from models.validation import ValidationResult
+
+# Lowercased "first last" expression; must match idx_patients_name_trgm exactly
+NAME_SEARCH_EXPRESSION = "lower(first_name || ' ' || last_name)"
 
 class Patient(BaseModel):
     """
@@ -12,9 +19,35 @@ class Patient(BaseModel):
     - Abstraction: Hides complex validation logic
     """
     
+    __slots__ = ('_first_name', '_last_name', '_date_of_birth', '_gender', '_contact_number',
+                 '_contact_digits', '_birth_date', '_age', '_age_on', '_full_name')
+    
+    _columns = ('id', 'first_name', 'last_name', 'date_of_birth', 'gender',
+                'contact_number', 'created_at', 'updated_at', 'contact_digits')
+    _page_orders = {**BaseModel._page_orders, 'name': ('last_name', 'first_name', 'id')}
+    _page_key_types = {**BaseModel._page_key_types, 'last_name': str, 'first_name': str}
+    # contact_digits is filled by a database trigger (see migrations.py)
+    _read_only_columns = BaseModel._read_only_columns + ('contact_digits',)
+    
+    # to_dict() rendered by Postgres; date::text and _timestamp_text match str() of dates and timestamps
+    _json_fields = {
+        'id': 'id',
+        'first_name': 'first_name',
+        'last_name': 'last_name',
+        'date_of_birth': 'date_of_birth::text',
+        'gender': 'gender',
+        'contact_number': 'contact_number',
+        'created_at': BaseModel._timestamp_text('created_at'),
+        'updated_at': BaseModel._timestamp_text('updated_at')
+    }
+    
+    # Whether pg_trgm is installed (checked once per process)
+    _trigram_available: Optional[bool] = None
+    
     def __init__(self, first_name: str, last_name: str, date_of_birth: str, 
                  gender: str, contact_number: str, **kwargs):
         """Initialize Patient with validation"""
+        contact_digits = kwargs.pop('contact_digits', None)
         super().__init__(**kwargs)
         
         # Encapsulation: Private attributes with validation
@@ -23,10 +56,37 @@ class Patient(BaseModel):
         self._date_of_birth = date_of_birth
         self._gender = gender
         self._contact_number = contact_number
+        self._contact_digits = contact_digits
+        self._reset_derived()
         
         # Validate on initialization
         if not self.validate():
             raise ValueError("Invalid patient data")
+        self._validated = True
+    
+    @classmethod
+    def from_validated(cls, result: ValidationResult, **kwargs) -> 'Patient':
+        """
+        Build a Patient from a successful validate_patient_data() result.
+        The payload was checked exactly once, so this skips __init__ validation and
+        keeps the parsed birth date and contact digits from the result.
+        """
+        if not result.is_valid:
+            raise ValueError(f"Invalid patient data: {result.error_message()}")
+        
+        data = result.data
+        patient = cls.__new__(cls)
+        BaseModel.__init__(patient, **kwargs)
+        patient._first_name = data['first_name']
+        patient._last_name = data['last_name']
+        patient._date_of_birth = data['date_of_birth']
+        patient._gender = data['gender']
+        patient._contact_number = data['contact_number']
+        patient._contact_digits = result.contact_digits
+        patient._reset_derived()
+        patient._birth_date = result.birth_date
+        patient._validated = True
+        return patient
     
     # Encapsulation: Properties with validation
     @property
@@ -39,7 +99,10 @@ class Patient(BaseModel):
         """Set first name with validation"""
         if not self._validate_name(value):
             raise ValueError("Invalid first name")
+        if value != self._first_name:
+            self._mark_dirty('first_name')
         self._first_name = value
+        self._full_name = None
     
     @property
     def last_name(self) -> str:
@@ -51,11 +114,17 @@ class Patient(BaseModel):
         """Set last name with validation"""
         if not self._validate_name(value):
             raise ValueError("Invalid last name")
+        if value != self._last_name:
+            self._mark_dirty('last_name')
         self._last_name = value
+        self._full_name = None
     
     @property
     def date_of_birth(self) -> str:
-        """Get date of birth"""
+        """Get date of birth (YYYY-MM-DD)"""
+        if self._date_of_birth is None and self._birth_date is not None:
+            # Rows keep only the parsed date; the string form is derived on demand
+            return self._birth_date.isoformat()
         return self._date_of_birth
     
     @date_of_birth.setter
@@ -63,7 +132,11 @@ class Patient(BaseModel):
         """Set date of birth with validation"""
         if not self._validate_date(value):
             raise ValueError("Invalid date of birth")
+        if value != self.date_of_birth:
+            self._mark_dirty('date_of_birth')
         self._date_of_birth = value
+        self._birth_date = None
+        self._age_on = None
     
     @property
     def gender(self) -> str:
@@ -75,6 +148,8 @@ class Patient(BaseModel):
         """Set gender with validation"""
         if not self._validate_gender(value):
             raise ValueError("Invalid gender")
+        if value != self._gender:
+            self._mark_dirty('gender')
         self._gender = value
     
     @property
@@ -87,7 +162,17 @@ class Patient(BaseModel):
         """Set contact number with validation"""
         if not self._validate_contact(value):
             raise ValueError("Invalid contact number")
+        if value != self._contact_number:
+            self._mark_dirty('contact_number')
         self._contact_number = value
+        self._contact_digits = None
+    
+    @property
+    def contact_digits(self) -> str:
+        """Get the digits-only contact number (normalized once, stored in the database)"""
+        if self._contact_digits is None:
+            self._contact_digits = self.normalize_contact(self._contact_number)
+        return self._contact_digits
     
     # Polymorphism: Implementation of abstract methods
     def to_dict(self) -> Dict[str, Any]:
@@ -96,7 +181,7 @@ class Patient(BaseModel):
             'id': self._id,
             'first_name': self._first_name,
             'last_name': self._last_name,
-            'date_of_birth': self._date_of_birth,
+            'date_of_birth': self.date_of_birth,
             'gender': self._gender,
             'contact_number': self._contact_number,
             'created_at': str(self._created_at) if self._created_at else None,
@@ -108,7 +193,7 @@ class Patient(BaseModel):
         return (
             self._validate_name(self._first_name) and
             self._validate_name(self._last_name) and
-            self._validate_date(self._date_of_birth) and
+            self._validate_date(self.date_of_birth) and
             self._validate_gender(self._gender) and
             self._validate_contact(self._contact_number)
         )
@@ -116,81 +201,126 @@ class Patient(BaseModel):
     def _get_insert_data(self) -> tuple[List[str], List[Any]]:
         """Get fields and values for INSERT"""
         fields = ['first_name', 'last_name', 'date_of_birth', 'gender', 'contact_number']
-        values = [self._first_name, self._last_name, self._date_of_birth, 
+        values = [self._first_name, self._last_name, self.date_of_birth, 
                  self._gender, self._contact_number]
         return fields, values
     
     def _get_update_data(self) -> tuple[List[str], List[Any]]:
         """Get fields and values for UPDATE"""
         fields = ['first_name', 'last_name', 'date_of_birth', 'gender', 'contact_number']
-        values = [self._first_name, self._last_name, self._date_of_birth, 
+        values = [self._first_name, self._last_name, self.date_of_birth, 
                  self._gender, self._contact_number]
         return fields, values
     
+    @classmethod
+    def _prepare_update(cls, changes: Dict[str, Any], validated: bool = False) -> Dict[str, Any]:
+        """Keep the writable columns of an update, validating each value"""
+        columns = super()._prepare_update(changes, validated)
+        if validated:
+            return columns
+        
+        checks = {
+            'first_name': (validation.is_valid_name, "Invalid first name"),
+            'last_name': (validation.is_valid_name, "Invalid last name"),
+            'date_of_birth': (lambda value: validation.parse_birth_date(value) is not None, "Invalid date of birth"),
+            'gender': (validation.is_valid_gender, "Invalid gender"),
+            'contact_number': (
+                lambda value: isinstance(value, str) and
+                validation.is_valid_contact_digits(validation.normalize_contact(value)),
+                "Invalid contact number"
+            ),
+        }
+        for column, value in columns.items():
+            check, message = checks[column]
+            if not check(value):
+                raise ValueError(message)
+        return columns
+    
     @classmethod
     def _create_from_row(cls, row: tuple) -> 'Patient':
-        """Create Patient instance from database row"""
-        return cls(
+        """
+        Create Patient instance from database row.
+        Rows were validated when they were written, so this trusted path skips
+        __init__ validation (regexes, strptime); user input must go through Patient(...).
+        """
+        patient = cls.__new__(cls)
+        BaseModel.__init__(
+            patient,
             id=row[0],
-            first_name=row[1],
-            last_name=row[2],
-            date_of_birth=str(row[3]) if row[3] else None,
-            gender=row[4],
-            contact_number=row[5],
             created_at=row[6] if len(row) > 6 else None,
             updated_at=row[7] if len(row) > 7 else None
         )
+        patient._first_name = row[1]
+        patient._last_name = row[2]
+        patient._gender = row[4]
+        patient._contact_number = row[5]
+        patient._contact_digits = row[8] if len(row) > 8 else None
+        patient._reset_derived()
+        patient._validated = True
+        patient._dirty = cls._CLEAN
+        if isinstance(row[3], date):
+            # The driver already returns a date object; keep it so it is never re-parsed
+            patient._date_of_birth = None
+            patient._birth_date = row[3]
+        else:
+            patient._date_of_birth = str(row[3]) if row[3] else None
+        return patient
     
-    # Abstraction: Private validation methods
+    # Abstraction: Private validation methods (shared rules in models.validation)
     def _validate_name(self, name: str) -> bool:
         """Validate name format"""
-        if not name or not isinstance(name, str):
-            return False
-        # Allow letters, spaces, hyphens, and apostrophes
-        return bool(re.match(r"^[A-Za-z\s\-']{2,50}$", name.strip()))
+        return validation.is_valid_name(name)
     
     def _validate_date(self, date_str: str) -> bool:
         """Validate date format"""
-        if not date_str or not isinstance(date_str, str):
-            return False
-        try:
-            # Check if it's a valid date in YYYY-MM-DD format
-            parsed_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-            # Check if date is not in the future
-            return parsed_date <= date.today()
-        except ValueError:
-            return False
+        return validation.parse_birth_date(date_str) is not None
     
     def _validate_gender(self, gender: str) -> bool:
         """Validate gender"""
-        if not gender or not isinstance(gender, str):
-            return False
-        return gender.strip().lower() in ['male', 'female', 'other']
+        return validation.is_valid_gender(gender)
     
     def _validate_contact(self, contact: str) -> bool:
         """Validate contact number"""
         if not contact or not isinstance(contact, str):
             return False
-        # Remove all non-digit characters and check length
-        digits_only = re.sub(r'\D', '', contact)
-        return 7 <= len(digits_only) <= 15
+        return validation.is_valid_contact_digits(self.normalize_contact(contact))
+    
+    def _reset_derived(self):
+        """Clear cached derived values (parsed birth date, age, full name)"""
+        self._birth_date = None
+        self._age = None
+        self._age_on = None
+        self._full_name = None
+    
+    @staticmethod
+    def normalize_contact(contact: str) -> str:
+        """Strip everything but digits from a contact number"""
+        return validation.normalize_contact(contact)
     
     # Business logic methods
     def get_full_name(self) -> str:
         """Get patient's full name"""
-        return f"{self._first_name} {self._last_name}"
+        if self._full_name is None:
+            self._full_name = f"{self._first_name} {self._last_name}"
+        return self._full_name
     
     def get_age(self) -> Optional[int]:
-        """Calculate patient's age"""
+        """Calculate patient's age (computed once per instance per day)"""
+        today = date.today()
+        if self._age_on == today:
+            return self._age
         try:
-            birth_date = datetime.strptime(self._date_of_birth, '%Y-%m-%d').date()
-            today = date.today()
+            if self._birth_date is None:
+                self._birth_date = datetime.strptime(self._date_of_birth, '%Y-%m-%d').date()
+            birth_date = self._birth_date
             age = today.year - birth_date.year
             if today.month < birth_date.month or (today.month == birth_date.month and today.day < birth_date.day):
                 age -= 1
-            return age
         except (ValueError, TypeError):
-            return None
+            age = None
+        self._age = age
+        self._age_on = today
+        return age
     
     def is_adult(self) -> bool:
         """Check if patient is adult (18+)"""
@@ -199,81 +329,218 @@ class Patient(BaseModel):
     
     def get_formatted_contact(self) -> str:
         """Get formatted contact number"""
-        digits_only = re.sub(r'\D', '', self._contact_number)
+        digits_only = self.contact_digits
         if len(digits_only) == 10:
             return f"({digits_only[:3]}) {digits_only[3:6]}-{digits_only[6:]}"
         return self._contact_number
     
     # Class methods for advanced queries
     @classmethod
-    def search_by_name(cls, name: str) -> List['Patient']:
-        """Search patients by name (first or last)"""
-        try:
-            from db import get_connection
-            conn = get_connection()
+    def search_by_name(cls, name: str, limit: Optional[int] = None, mode: str = 'like',
+                       as_json: bool = False) -> List[Any]:
+        """
+        Search patients by name.
+        mode 'like' (default) is the plain LOWER(...) LIKE substring match; 'trigram'
+        also returns fuzzy (similarity) matches, ranked by similarity using the
+        pg_trgm GIN index; 'auto' uses trigram search when the extension is
+        installed and falls back to 'like' otherwise.
+        as_json returns to_dict() JSON text per match instead of Patient objects.
+        """
+        if mode not in ('auto', 'trigram', 'like'):
+            raise ValueError(f"Unsupported search mode: {mode}")
+        
+        if mode == 'trigram' or (mode == 'auto' and cls._has_trigram()):
+            try:
+                return cls._search_by_trigram(name, limit, as_json)
+            except pg_errors.UndefinedFunction:
+                # Extension dropped since we checked
+                cls._trigram_available = False
+                if mode == 'trigram':
+                    raise
+        return cls._search_by_like(name, limit, as_json)
+    
+    @classmethod
+    def _search_by_trigram(cls, name: str, limit: Optional[int], as_json: bool = False) -> List[Any]:
+        """Similarity-ranked search backed by the trigram index"""
+        term = name.strip().lower()
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            # LIKE covers substrings, the %% (similarity) operator covers typos; both use the GIN index
+            execute(cursor, f"""
+                SELECT {cls._json_select() if as_json else cls._select_list()}
+                FROM patients
+                WHERE {NAME_SEARCH_EXPRESSION} LIKE %s OR {NAME_SEARCH_EXPRESSION} %% %s
+                ORDER BY similarity({NAME_SEARCH_EXPRESSION}, %s) DESC, last_name, first_name, id
+                LIMIT %s
+            """, (f"%{escape_like(term)}%", term, term, limit))
+            rows = cursor.fetchall()
+        
+        return cls._rows_to_results(rows, as_json)
+    
+    @classmethod
+    def _search_by_like(cls, name: str, limit: Optional[int], as_json: bool = False) -> List[Any]:
+        """Plain substring search on first or last name"""
+        with read_connection() as conn:
             cursor = conn.cursor()
             
-            search_term = f"%{name.lower()}%"
-            cursor.execute("""
-                SELECT * FROM patients 
+            search_term = f"%{escape_like(name.lower())}%"
+            execute(cursor, """
+                SELECT {columns}
+                FROM patients 
                 WHERE LOWER(first_name) LIKE %s OR LOWER(last_name) LIKE %s 
                 ORDER BY first_name, last_name
-            """, (search_term, search_term))
+                LIMIT %s
+            """.format(columns=cls._json_select() if as_json else cls._select_list()),
+                (search_term, search_term, limit))
             
             rows = cursor.fetchall()
-            return [cls._create_from_row(row) for row in rows]
-            
-        except Exception as e:
-            raise e
-        finally:
-            if conn:
-                conn.close()
+        
+        return cls._rows_to_results(rows, as_json)
+    
+    @classmethod
+    def _rows_to_results(cls, rows: List[tuple], as_json: bool) -> List[Any]:
+        """Hydrate rows, or unwrap the JSON text of JSON-projected rows"""
+        if as_json:
+            return [row[0] for row in rows]
+        return [cls._create_from_row(row) for row in rows]
+    
+    @classmethod
+    def _has_trigram(cls) -> bool:
+        """Check (once) whether the pg_trgm extension is installed"""
+        if cls._trigram_available is None:
+            with read_connection() as conn:
+                cursor = conn.cursor()
+                execute(cursor, "SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+                cls._trigram_available = bool(cursor.fetchone()[0])
+        return cls._trigram_available
     
     @classmethod
     def get_by_gender(cls, gender: str) -> List['Patient']:
         """Get patients by gender"""
-        try:
-            from db import get_connection
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT * FROM patients WHERE LOWER(gender) = %s ORDER BY first_name", 
-                         (gender.lower(),))
-            
-            rows = cursor.fetchall()
-            return [cls._create_from_row(row) for row in rows]
-            
-        except Exception as e:
-            raise e
-        finally:
-            if conn:
-                conn.close()
+        return cls.query_by_gender(gender).all()
+    
+    @classmethod
+    def query_by_gender(cls, gender: str) -> Query:
+        """Query for patients of a gender (case-insensitive)"""
+        return cls.query().filter(gender__iexact=gender).order_by('first_name')
     
     @classmethod
     def get_adults(cls) -> List['Patient']:
         """Get all adult patients (18+)"""
-        try:
-            from db import get_connection
-            conn = get_connection()
+        return cls.query_adults().all()
+    
+    @classmethod
+    def query_adults(cls) -> Query:
+        """Query for adult patients (18+)"""
+        # Range predicate on the raw column so the date_of_birth index can be used
+        return (cls.query()
+                .filter(date_of_birth__lte=cls.latest_birth_date(18))
+                .order_by('first_name', 'last_name'))
+    
+    @classmethod
+    def find_by_contact(cls, contact: str) -> List['Patient']:
+        """Find patients by contact number regardless of formatting (index probe on contact_digits)"""
+        return cls.query().filter(contact_digits=cls.normalize_contact(contact)).order_by('id').all()
+    
+    @classmethod
+    def get_duplicate_contact_groups(cls) -> List[List['Patient']]:
+        """Get groups of patients sharing a normalized contact number"""
+        with read_connection() as conn:
             cursor = conn.cursor()
-            
-            # Calculate age and filter adults
-            cursor.execute("""
-                SELECT *, 
-                       EXTRACT(YEAR FROM AGE(CURRENT_DATE, date_of_birth)) as age
-                FROM patients 
-                WHERE EXTRACT(YEAR FROM AGE(CURRENT_DATE, date_of_birth)) >= 18
-                ORDER BY first_name, last_name
+            execute(cursor, f"""
+                SELECT {cls._select_list()}
+                FROM patients
+                WHERE contact_digits IN (
+                    SELECT contact_digits FROM patients
+                    GROUP BY contact_digits
+                    HAVING COUNT(*) > 1
+                )
+                ORDER BY contact_digits, id
             """)
-            
             rows = cursor.fetchall()
-            return [cls._create_from_row(row) for row in rows]
+        
+        groups: Dict[str, List['Patient']] = {}
+        for row in rows:
+            patient = cls._create_from_row(row)
+            groups.setdefault(patient.contact_digits, []).append(patient)
+        return list(groups.values())
+    
+    @classmethod
+    def get_demographics(cls, today: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Aggregate counts, ages and age-group buckets per gender in one query"""
+        today = today or date.today()
+        with read_connection() as conn:
+            cursor = conn.cursor()
             
-        except Exception as e:
-            raise e
-        finally:
-            if conn:
-                conn.close()
+            # Age is computed once per row in the subquery; buckets mirror PatientService._get_age_group
+            execute(cursor, """
+                SELECT gender,
+                       COUNT(*),
+                       COUNT(age), COALESCE(SUM(age), 0), MIN(age), MAX(age),
+                       COUNT(*) FILTER (WHERE age >= 18),
+                       COUNT(*) FILTER (WHERE age < 18),
+                       COUNT(*) FILTER (WHERE age >= 18 AND age < 30),
+                       COUNT(*) FILTER (WHERE age >= 30 AND age < 50),
+                       COUNT(*) FILTER (WHERE age >= 50 AND age < 65),
+                       COUNT(*) FILTER (WHERE age >= 65),
+                       COUNT(*) FILTER (WHERE age IS NULL)
+                FROM (
+                    SELECT LOWER(gender) AS gender,
+                           EXTRACT(YEAR FROM AGE(%s::date, date_of_birth))::int AS age
+                    FROM patients
+                ) AS ages
+                GROUP BY gender
+            """, (today,))
+            
+            rows = cursor.fetchall()
+        
+        keys = ('gender', 'total', 'aged', 'age_sum', 'min_age', 'max_age', 'adults',
+                'Minor', 'Young Adult', 'Adult', 'Middle-aged', 'Senior', 'Unknown')
+        return [dict(zip(keys, row)) for row in rows]
+    
+    @classmethod
+    def csv_export_sql(cls, today: Optional[date] = None) -> str:
+        """
+        SELECT producing the CSV export columns, with the derived ones (full name,
+        age, formatted contact, adult flag) computed by Postgres
+        """
+        today = today or date.today()
+        # Date objects only, so the ISO literals are safe to inline (COPY takes no parameters)
+        return f"""
+            SELECT id AS "ID",
+                   first_name AS "First Name",
+                   last_name AS "Last Name",
+                   first_name || ' ' || last_name AS "Full Name",
+                   date_of_birth AS "Date of Birth",
+                   EXTRACT(YEAR FROM AGE(DATE '{today.isoformat()}', date_of_birth))::int AS "Age",
+                   gender AS "Gender",
+                   contact_number AS "Contact Number",
+                   CASE WHEN length(contact_digits) = 10
+                        THEN '(' || substr(contact_digits, 1, 3) || ') ' || substr(contact_digits, 4, 3)
+                             || '-' || substr(contact_digits, 7)
+                        ELSE contact_number
+                   END AS "Formatted Contact",
+                   CASE WHEN date_of_birth <= DATE '{cls.latest_birth_date(18, today).isoformat()}'
+                        THEN 'True' ELSE 'False'
+                   END AS "Is Adult",
+                   {cls._timestamp_text('created_at')} AS "Created At",
+                   {cls._timestamp_text('updated_at')} AS "Updated At"
+            FROM patients
+            ORDER BY id
+        """
+    
+    @staticmethod
+    def latest_birth_date(age: int, today: Optional[date] = None) -> date:
+        """
+        Get the latest birth date of someone who is at least `age` years old today,
+        so "age >= N" becomes "date_of_birth <= latest_birth_date(N)".
+        """
+        today = today or date.today()
+        try:
+            return today.replace(year=today.year - age)
+        except ValueError:
+            # Today is Feb 29 and the target year is not a leap year
+            return today.replace(year=today.year - age, day=28)
     
     # Magic methods for better object representation
     def __str__(self) -> str:
@@ -0,0 +1,140 @@
+from datetime import date
+from typing import Any, Dict, List, Optional
+import numpy as np
+from db import execute, primary_read_connection
+
+# Age group upper bounds and labels; mirrors PatientService._get_age_group
+AGE_GROUP_BOUNDS = [18, 30, 50, 65]
+AGE_GROUP_LABELS = ['Minor', 'Young Adult', 'Adult', 'Middle-aged', 'Senior']
+
+class PatientFrame:
+    """
+    Columnar, NumPy-backed snapshot of the patients table:
+    - ids as int64, birth dates as datetime64[D], genders as categorical codes
+    - Vectorized age computation, masks and bincount histograms
+    - Built straight from a server-side cursor, without Patient objects
+    """
+
+    def __init__(self, ids: np.ndarray, birth_dates: np.ndarray, gender_codes: np.ndarray,
+                 gender_categories: List[str]):
+        """Initialize from prepared column arrays"""
+        self.ids = ids
+        self.birth_dates = birth_dates
+        self.gender_codes = gender_codes
+        self.gender_categories = gender_categories
+        self._ages: Optional[np.ndarray] = None
+        self._ages_on: Optional[date] = None
+
+    @classmethod
+    def from_cursor(cls, cursor, batch_size: int = 50000) -> 'PatientFrame':
+        """Build a frame from a cursor yielding (id, days since 1970-01-01, lowercased gender) rows"""
+        categories: Dict[str, int] = {}
+        id_chunks, day_chunks, gender_chunks = [], [], []
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            count = len(rows)
+            id_chunks.append(np.fromiter((row[0] for row in rows), dtype=np.int64, count=count))
+            day_chunks.append(np.fromiter((row[1] for row in rows), dtype=np.int64, count=count))
+            gender_chunks.append(np.fromiter(
+                (categories.setdefault(row[2], len(categories)) for row in rows),
+                dtype=np.int16, count=count
+            ))
+
+        def concat(chunks, dtype):
+            return np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+
+        return cls(
+            ids=concat(id_chunks, np.int64),
+            birth_dates=concat(day_chunks, np.int64).astype('datetime64[D]'),
+            gender_codes=concat(gender_chunks, np.int16),
+            gender_categories=list(categories)
+        )
+
+    @classmethod
+    def from_db(cls, batch_size: int = 50000) -> 'PatientFrame':
+        """Load the patients table into a frame through a server-side cursor (from the primary)"""
+        # Frames are cached across requests; a lagging replica would pin stale data until the next reload
+        with primary_read_connection() as conn:
+            cursor = conn.cursor(name='patients_frame')
+            cursor.itersize = batch_size
+            # Dates travel as plain integers (days since epoch) to skip date object creation
+            execute(cursor, """
+                SELECT id, date_of_birth - DATE '1970-01-01', LOWER(gender)
+                FROM patients
+                ORDER BY id
+            """)
+            frame = cls.from_cursor(cursor, batch_size)
+            cursor.close()
+        return frame
+
+    # Vectorized computations
+    def ages(self, today: Optional[date] = None) -> np.ndarray:
+        """Get every patient's age in whole years (cached per day)"""
+        today = today or date.today()
+        if self._ages is not None and self._ages_on == today:
+            return self._ages
+
+        years = self.birth_dates.astype('datetime64[Y]')
+        months = self.birth_dates.astype('datetime64[M]')
+        birth_year = years.astype(np.int64) + 1970
+        birth_month = (months - years).astype(np.int64) + 1
+        birth_day = (self.birth_dates - months).astype(np.int64) + 1
+
+        # Birthday not reached yet this year
+        before_birthday = (birth_month > today.month) | ((birth_month == today.month) & (birth_day > today.day))
+        self._ages = today.year - birth_year - before_birthday.astype(np.int64)
+        self._ages_on = today
+        return self._ages
+
+    def adult_mask(self, today: Optional[date] = None) -> np.ndarray:
+        """Boolean mask of patients aged 18 or over"""
+        return self.ages(today) >= 18
+
+    def age_range_mask(self, min_age: int, max_age: int, today: Optional[date] = None) -> np.ndarray:
+        """Boolean mask of patients with min_age <= age <= max_age"""
+        ages = self.ages(today)
+        return (ages >= min_age) & (ages <= max_age)
+
+    def gender_histogram(self) -> Dict[str, int]:
+        """Count patients per (lowercased) gender"""
+        counts = np.bincount(self.gender_codes, minlength=len(self.gender_categories))
+        return {category: int(counts[code]) for code, category in enumerate(self.gender_categories)}
+
+    def age_group_histogram(self, today: Optional[date] = None) -> Dict[str, int]:
+        """Count patients per age group"""
+        buckets = np.digitize(self.ages(today), AGE_GROUP_BOUNDS)
+        counts = np.bincount(buckets, minlength=len(AGE_GROUP_LABELS))
+        return {label: int(counts[index]) for index, label in enumerate(AGE_GROUP_LABELS)}
+
+    def ids_where(self, mask: np.ndarray) -> List[int]:
+        """Get the patient IDs selected by a mask"""
+        return self.ids[mask].tolist()
+
+    def statistics(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """Compute PatientService.get_statistics from the frame"""
+        ages = self.ages(today)
+        total = len(self)
+        adults = int(np.count_nonzero(ages >= 18))
+        return {
+            'total_patients': total,
+            'adults': adults,
+            'minors': total - adults,
+            'gender_distribution': self.gender_histogram(),
+            'average_age': round(float(ages.mean()), 1) if total else 0,
+            'age_range': {
+                'min': int(ages.min()) if total else 0,
+                'max': int(ages.max()) if total else 0
+            },
+            'age_groups': {**self.age_group_histogram(today), 'Unknown': 0}
+        }
+
+    def __len__(self) -> int:
+        """Number of patients in the frame"""
+        return int(self.ids.shape[0])
+
+    def __repr__(self) -> str:
+        """Short description"""
+        return f"PatientFrame(rows={len(self)}, genders={self.gender_categories})"
@@ -0,0 +1,214 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from db import execute, read_connection
+
+def escape_like(value: str) -> str:
+    """Escape LIKE wildcards so the term is matched literally"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+class Query:
+    """
+    Composable query over one model table:
+    - Immutable: filter/exclude/order_by/limit/only return new queries
+    - Compiles to parameterized SQL; values are never interpolated
+    - Caches the compiled SQL text per query shape, so repeated queries
+      with different values reuse the same statement string
+    """
+
+    # lookup -> (SQL template, value transform); {col} is the column name
+    _LOOKUPS: Dict[str, Tuple[str, Optional[Callable[[Any], Any]]]] = {
+        'exact': ('{col} = %s', None),
+        'ne': ('{col} <> %s', None),
+        'lt': ('{col} < %s', None),
+        'lte': ('{col} <= %s', None),
+        'gt': ('{col} > %s', None),
+        'gte': ('{col} >= %s', None),
+        'in': ('{col} = ANY(%s)', list),
+        'iexact': ('LOWER({col}) = %s', lambda value: value.lower()),
+        'icontains': ("LOWER({col}) LIKE %s", lambda value: f"%{escape_like(value.lower())}%"),
+        'istartswith': ("LOWER({col}) LIKE %s", lambda value: f"{escape_like(value.lower())}%"),
+    }
+
+    # Compiled SQL text keyed by query shape (shared by all queries)
+    _sql_cache: Dict[tuple, str] = {}
+
+    def __init__(self, model_class: type):
+        """Initialize an unfiltered query for a model class"""
+        self._model_class = model_class
+        self._filters: Tuple[tuple, ...] = ()  # (negated, column, lookup, value)
+        self._order: Tuple[str, ...] = ()
+        self._limit: Optional[int] = None
+        self._only: Tuple[str, ...] = ()
+
+    # Builder methods
+    def filter(self, **lookups) -> 'Query':
+        """Keep rows matching every lookup (column=value or column__lookup=value)"""
+        return self._with_filters(False, lookups)
+
+    def exclude(self, **lookups) -> 'Query':
+        """Drop rows matching the lookups (each one negated)"""
+        return self._with_filters(True, lookups)
+
+    def order_by(self, *columns: str) -> 'Query':
+        """Order by columns; prefix a column with '-' for descending order"""
+        for column in columns:
+            self._check_column(column.lstrip('-'))
+        return self._clone(_order=tuple(columns))
+
+    def limit(self, count: int) -> 'Query':
+        """Return at most `count` rows"""
+        if count < 0:
+            raise ValueError("limit must not be negative")
+        return self._clone(_limit=count)
+
+    def only(self, *columns: str) -> 'Query':
+        """Select only these columns; results become dicts instead of models"""
+        for column in columns:
+            self._check_column(column)
+        return self._clone(_only=tuple(columns))
+
+    # Terminal methods
+    def all(self) -> List[Any]:
+        """Run the query and return models (or dicts when only() is used)"""
+        sql, params = self.compile()
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            execute(cursor, sql, params)
+            rows = cursor.fetchall()
+        return [self._hydrate(row) for row in rows]
+
+    def iter(self, batch_size: int = 2000) -> Iterator[Any]:
+        """Stream results through a server-side cursor"""
+        sql, params = self.compile()
+        with read_connection() as conn:
+            cursor = conn.cursor(name=f"{self._model_class._get_table_name()}_query_iter")
+            cursor.itersize = batch_size
+            execute(cursor, sql, params)
+            for row in cursor:
+                yield self._hydrate(row)
+            cursor.close()
+    
+    def iter_json(self, batch_size: int = 2000) -> Iterator[str]:
+        """Stream each result as to_dict() JSON text rendered by Postgres (no model objects)"""
+        sql, params = self.compile('json')
+        with read_connection() as conn:
+            cursor = conn.cursor(name=f"{self._model_class._get_table_name()}_query_json")
+            cursor.itersize = batch_size
+            execute(cursor, sql, params)
+            for row in cursor:
+                yield row[0]
+            cursor.close()
+
+    def first(self) -> Optional[Any]:
+        """Get the first result or None"""
+        results = self.limit(1).all()
+        return results[0] if results else None
+
+    def count(self) -> int:
+        """Count matching rows"""
+        sql, params = self.compile('count')
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            execute(cursor, sql, params)
+            return cursor.fetchone()[0]
+
+    def exists(self) -> bool:
+        """Check whether any row matches"""
+        sql, params = self.compile('exists')
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            execute(cursor, sql, params)
+            return bool(cursor.fetchone()[0])
+
+    def __iter__(self) -> Iterator[Any]:
+        """Iterate over all results"""
+        return iter(self.all())
+
+    # Compilation
+    def compile(self, mode: str = 'select') -> Tuple[str, List[Any]]:
+        """Compile to (sql, params); mode is 'select', 'json', 'count' or 'exists'"""
+        rows = mode in ('select', 'json')
+        shape = (
+            mode,
+            self._model_class._get_table_name(),
+            tuple((negated, column, lookup) for negated, column, lookup, _ in self._filters),
+            self._order if rows else (),
+            self._limit is not None and rows,
+            self._only if mode == 'select' else ()
+        )
+        sql = self._sql_cache.get(shape)
+        if sql is None:
+            sql = self._build_sql(*shape)
+            self._sql_cache[shape] = sql
+
+        params = []
+        for _, _, lookup, value in self._filters:
+            transform = self._LOOKUPS[lookup][1]
+            params.append(transform(value) if transform else value)
+        if rows and self._limit is not None:
+            params.append(self._limit)
+        return sql, params
+
+    def _build_sql(self, mode: str, table_name: str, filters: tuple, order: tuple,
+                   has_limit: bool, only: tuple) -> str:
+        """Render the SQL text for one query shape"""
+        conditions = []
+        for negated, column, lookup in filters:
+            condition = self._LOOKUPS[lookup][0].format(col=column)
+            conditions.append(f"NOT ({condition})" if negated else condition)
+        where_clause = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        if mode == 'count':
+            return f"SELECT COUNT(*) FROM {table_name}{where_clause}"
+        if mode == 'exists':
+            return f"SELECT EXISTS (SELECT 1 FROM {table_name}{where_clause})"
+
+        if mode == 'json':
+            columns = self._model_class._json_select()
+        else:
+            columns = ', '.join(only) if only else self._model_class._select_list()
+        sql = f"SELECT {columns} FROM {table_name}{where_clause}"
+        if order:
+            sql += " ORDER BY " + ', '.join(
+                f"{column[1:]} DESC" if column.startswith('-') else column for column in order
+            )
+        if has_limit:
+            sql += " LIMIT %s"
+        return sql
+
+    # Private helpers
+    def _with_filters(self, negated: bool, lookups: Dict[str, Any]) -> 'Query':
+        """Add parsed lookups to a copy of this query"""
+        filters = list(self._filters)
+        for key, value in lookups.items():
+            column, _, lookup = key.partition('__')
+            lookup = lookup or 'exact'
+            self._check_column(column)
+            if lookup not in self._LOOKUPS:
+                raise ValueError(f"Unsupported lookup: {lookup}")
+            if value is None and lookup in ('exact', 'ne'):
+                raise ValueError(f"Use a non-None value for {key}")
+            filters.append((negated, column, lookup, value))
+        return self._clone(_filters=tuple(filters))
+
+    def _check_column(self, column: str):
+        """Only known columns may be interpolated into SQL"""
+        if column not in self._model_class._columns:
+            raise ValueError(f"Unknown column for {self._model_class.__name__}: {column}")
+
+    def _hydrate(self, row: tuple) -> Any:
+        """Turn a result row into a model, or a dict for only() queries"""
+        if self._only:
+            return dict(zip(self._only, row))
+        return self._model_class._create_from_row(row)
+
+    def _clone(self, **changes) -> 'Query':
+        """Copy this query with some attributes replaced"""
+        clone = Query.__new__(Query)
+        clone.__dict__.update(self.__dict__)
+        clone.__dict__.update(changes)
+        return clone
+
+    def __repr__(self) -> str:
+        """Show the compiled SQL"""
+        sql, params = self.compile()
+        return f"Query({sql!r}, {params!r})"
@@ -0,0 +1,186 @@
+from contextlib import ExitStack
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from db import bind_session, connection
+
+# Unit of work that BaseModel.save()/delete() enlist in, if any
+_current: ContextVar[Optional['UnitOfWork']] = ContextVar('unit_of_work', default=None)
+
+class UnitOfWork:
+    """
+    Session that groups model writes into one transaction:
+    - save()/delete() inside `with UnitOfWork():` are queued instead of executed
+    - flush() writes queued inserts, updates (changed columns only) and deletes
+      (in reverse model order), each batched per model
+    - Rollback marks flushed updates dirty again, so a retried save() rewrites them
+    - One connection and one commit for the whole block; rollback on error
+    - Every connection() call in the block (reads, bulk operations) shares the
+      unit's transaction; call flush() to make queued writes visible to reads
+    """
+
+    def __init__(self):
+        """Initialize an empty unit of work"""
+        self._new: Dict[int, object] = {}
+        self._dirty: Dict[int, object] = {}
+        self._deleted: Dict[int, object] = {}
+        self._inserted: List[object] = []
+        self._removed: List[object] = []
+        self._updated: List[object] = []
+        self._touched: List[object] = []
+        self._stack: Optional[ExitStack] = None
+        self._token = None
+        self._joined: Optional['UnitOfWork'] = None
+
+    @staticmethod
+    def current() -> Optional['UnitOfWork']:
+        """Get the unit of work active in this context"""
+        return _current.get()
+
+    # Context management
+    def __enter__(self) -> 'UnitOfWork':
+        """Start the unit of work (nested blocks join the outer one)"""
+        outer = _current.get()
+        if outer is not None:
+            self._joined = outer
+            return outer
+        self._begin()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        """Flush and commit on success, roll back on error"""
+        if self._joined is not None:
+            return False
+        try:
+            if exc_type is not None:
+                self.rollback(exc_type, exc, tb)
+                return False
+            try:
+                self.commit()
+            except BaseException as error:
+                self.rollback(type(error), error, error.__traceback__)
+                raise
+        finally:
+            _current.reset(self._token)
+        return False
+
+    # Registration (called by BaseModel)
+    def register_save(self, instance):
+        """Queue an insert (no ID yet) or an update"""
+        key = id(instance)
+        if instance.id is None:
+            self._new[key] = instance
+        elif key not in self._deleted:
+            self._dirty[key] = instance
+
+    def register_delete(self, instance) -> bool:
+        """Queue a delete; returns False if there is nothing to delete"""
+        key = id(instance)
+        if self._new.pop(key, None) is not None:
+            # Never written: just forget it
+            return True
+        if instance.id is None:
+            return False
+        self._dirty.pop(key, None)
+        self._deleted[key] = instance
+        return True
+
+    # Writing
+    def flush(self):
+        """Write the queued changes inside the unit's transaction"""
+        if not (self._new or self._dirty or self._deleted):
+            return
+        # Real writes below must not be queued again
+        token = _current.set(None)
+        try:
+            for model_class, instances in self._group(self._new.values()):
+                failures = model_class.bulk_insert(instances)
+                self._inserted.extend(instances)
+                if failures:
+                    raise failures[0][1]
+
+            # Recorded up front: a failure later in the flush must not leave them marked clean
+            self._updated.extend(self._dirty.values())
+            for model_class, instances in self._group(self._dirty.values()):
+                model_class.bulk_update(instances)
+
+            for model_class, instances in reversed(self._group(self._deleted.values())):
+                model_class.delete_many([instance.id for instance in instances])
+        finally:
+            _current.reset(token)
+
+        self._touched.extend(self._new.values())
+        self._touched.extend(self._dirty.values())
+        self._removed.extend(self._deleted.values())
+        self._new.clear()
+        self._dirty.clear()
+        self._deleted.clear()
+
+    def commit(self):
+        """Flush remaining changes and commit once"""
+        self.flush()
+        if self._stack is not None:
+            stack, self._stack = self._stack, None
+            stack.close()
+            # Drop cache entries again so nothing read before the commit lingers
+            for instance in self._touched:
+                cache_id = instance.id
+                if cache_id is not None:
+                    instance._invalidate_cached(cache_id)
+            for instance in self._removed:
+                instance._invalidate_cached(instance.id)
+                instance.id = None
+            # Versions read while the unit was open saw the uncommitted state
+            for model_class in {type(instance) for instance in self._touched + self._removed}:
+                model_class._table_changed()
+        self._touched.clear()
+        self._inserted.clear()
+        self._removed.clear()
+        self._updated.clear()
+
+    def rollback(self, exc_type=None, exc=None, tb=None):
+        """Discard queued changes and roll back anything already flushed"""
+        if self._stack is not None:
+            stack, self._stack = self._stack, None
+            if exc_type is None:
+                exc_type, exc, tb = RuntimeError, RuntimeError("Unit of work rolled back"), None
+            try:
+                stack.__exit__(exc_type, exc, tb)
+            except BaseException as error:
+                if error is not exc:
+                    raise
+        # Inserts that never committed have no row behind their IDs
+        for instance in self._inserted:
+            instance.id = None
+        # Their changes were rolled back; unknown dirty state makes save() write every column
+        for instance in self._updated:
+            instance._dirty = None
+        self._new.clear()
+        self._dirty.clear()
+        self._deleted.clear()
+        self._inserted.clear()
+        self._removed.clear()
+        self._updated.clear()
+        self._touched.clear()
+
+    # Private helpers
+    def _begin(self):
+        """Check out the unit's connection and make connection() reuse it"""
+        if self._stack is None:
+            stack = ExitStack()
+            conn = stack.enter_context(connection())
+            stack.enter_context(bind_session(conn))
+            self._stack = stack
+
+    @staticmethod
+    def _group(instances) -> List[tuple]:
+        """Group instances by model class, in first-registration order"""
+        groups: Dict[type, List[object]] = {}
+        for instance in instances:
+            groups.setdefault(type(instance), []).append(instance)
+        return list(groups.items())
+
+    def __repr__(self) -> str:
+        """Show the queued work"""
+        return (f"UnitOfWork(new={len(self._new)}, dirty={len(self._dirty)}, "
+                f"deleted={len(self._deleted)})")
@@ -0,0 +1,113 @@
+import re
+from datetime import date, datetime
+from typing import Any, Dict, Mapping, Optional
+
+# Precompiled once at import; shared by Patient, the services and the factories
+NAME_PATTERN = re.compile(r"^[A-Za-z\s\-']{2,50}$")
+NON_DIGITS = re.compile(r'\D')
+VALID_GENDERS = frozenset(['male', 'female', 'other'])
+PATIENT_FIELDS = ('first_name', 'last_name', 'date_of_birth', 'gender', 'contact_number')
+
+def is_valid_name(name: Any) -> bool:
+    """Letters, spaces, hyphens and apostrophes; 2-50 characters"""
+    if not name or not isinstance(name, str):
+        return False
+    return NAME_PATTERN.match(name.strip()) is not None
+
+def parse_birth_date(date_str: Any, today: Optional[date] = None) -> Optional[date]:
+    """Parse a YYYY-MM-DD birth date; None if malformed or in the future"""
+    if not date_str or not isinstance(date_str, str):
+        return None
+    try:
+        parsed_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+    return parsed_date if parsed_date <= (today or date.today()) else None
+
+def is_valid_gender(gender: Any) -> bool:
+    """Male, female or other (case-insensitive)"""
+    if not gender or not isinstance(gender, str):
+        return False
+    return gender.strip().lower() in VALID_GENDERS
+
+def normalize_contact(contact: Optional[str]) -> str:
+    """Strip everything but digits from a contact number"""
+    return NON_DIGITS.sub('', contact or '')
+
+def is_valid_contact_digits(digits: str) -> bool:
+    """7 to 15 digits"""
+    return 7 <= len(digits) <= 15
+
+class ValidationResult:
+    """
+    Outcome of validating one patient payload:
+    - data: the five patient fields as submitted
+    - errors: field -> reason for every failed check
+    - birth_date / contact_digits: values parsed during validation, reused
+      by Patient.from_validated so nothing is parsed twice
+    """
+
+    __slots__ = ('data', 'errors', 'birth_date', 'contact_digits')
+
+    def __init__(self, data: Dict[str, Any], errors: Dict[str, str],
+                 birth_date: Optional[date] = None, contact_digits: Optional[str] = None):
+        """Initialize a validation result"""
+        self.data = data
+        self.errors = errors
+        self.birth_date = birth_date
+        self.contact_digits = contact_digits
+
+    @property
+    def is_valid(self) -> bool:
+        """True when every check passed"""
+        return not self.errors
+
+    def error_message(self) -> str:
+        """Human readable summary of the failed checks"""
+        return '; '.join(f"{field}: {reason}" for field, reason in self.errors.items())
+
+    def __bool__(self) -> bool:
+        """Truthiness follows is_valid"""
+        return self.is_valid
+
+    def __reduce__(self):
+        """Pickle as constructor arguments (results travel back from worker processes)"""
+        return (ValidationResult, (self.data, self.errors, self.birth_date, self.contact_digits))
+
+    def __repr__(self) -> str:
+        """Detailed string representation"""
+        return f"ValidationResult(valid={self.is_valid}, errors={self.errors})"
+
+def validate_patient_data(data: Mapping[str, Any], today: Optional[date] = None) -> ValidationResult:
+    """Validate a patient payload exactly once and collect every failure"""
+    values = {field: data.get(field) for field in PATIENT_FIELDS}
+    errors: Dict[str, str] = {}
+
+    for field in PATIENT_FIELDS:
+        if not values[field]:
+            errors[field] = "is required"
+
+    for field in ('first_name', 'last_name'):
+        if field not in errors and not is_valid_name(values[field]):
+            errors[field] = "must be 2-50 letters, spaces, hyphens or apostrophes"
+
+    birth_date = None
+    if 'date_of_birth' not in errors:
+        birth_date = parse_birth_date(values['date_of_birth'], today)
+        if birth_date is None:
+            errors['date_of_birth'] = "must be a YYYY-MM-DD date that is not in the future"
+
+    if 'gender' not in errors and not is_valid_gender(values['gender']):
+        errors['gender'] = "must be male, female or other"
+
+    contact_digits = None
+    if 'contact_number' not in errors:
+        if isinstance(values['contact_number'], str):
+            contact_digits = normalize_contact(values['contact_number'])
+        if contact_digits is None or not is_valid_contact_digits(contact_digits):
+            errors['contact_number'] = "must contain 7 to 15 digits"
+            contact_digits = None
+
+    # Report failures in field order
+    errors = {field: errors[field] for field in PATIENT_FIELDS if field in errors}
+    return ValidationResult(values, errors, birth_date, contact_digits)
@@ -0,0 +1,68 @@
+import threading
+from time import monotonic
+from typing import Dict, Optional, Tuple
+import psycopg2
+from db import execute, read_connection
+
+class TableVersions:
+    """
+    Per-table data versions for conditional GETs (ETags):
+    - The table_versions row maintained by database triggers (see migrations.py),
+      which covers writes from every process, script and psql session
+    - The database row is re-read at most every `refresh_interval` seconds,
+      and right after a local write; otherwise version() never touches the database
+    - No version (None) when the row cannot be read: a per-process counter would let
+      one worker hand out tags that another worker's writes already invalidated
+    """
+
+    def __init__(self, refresh_interval: float = 2.0):
+        """Initialize empty counters"""
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._local: Dict[str, int] = {}
+        # table -> (database version or None, local counter it was read at, read time)
+        self._db: Dict[str, Tuple[Optional[int], int, float]] = {}
+
+    def bump(self, table_name: str):
+        """Record a write to a table made by this process"""
+        with self._lock:
+            self._local[table_name] = self._local.get(table_name, 0) + 1
+
+    def version(self, table_name: str) -> Optional[str]:
+        """Get an opaque token that changes whenever the table's data changes (None if unknown)"""
+        with self._lock:
+            local = self._local.get(table_name, 0)
+            cached = self._db.get(table_name)
+        now = monotonic()
+        if cached is not None and cached[1] == local and now - cached[2] < self.refresh_interval:
+            db_version = cached[0]
+        else:
+            db_version = self._fetch(table_name)
+            with self._lock:
+                self._db[table_name] = (db_version, local, now)
+
+        if db_version is None:
+            return None
+        return f"v{db_version}"
+
+    def mark_stale(self, table_name: str):
+        """Re-read the database version on the next version() call"""
+        with self._lock:
+            self._db.pop(table_name, None)
+
+    def reset(self):
+        """Forget every cached database version"""
+        with self._lock:
+            self._db.clear()
+
+    @staticmethod
+    def _fetch(table_name: str) -> Optional[int]:
+        """Read the trigger-maintained version; None if the table_versions row is missing"""
+        try:
+            with read_connection() as conn:
+                cursor = conn.cursor()
+                execute(cursor, "SELECT version FROM table_versions WHERE table_name = %s", (table_name,))
+                row = cursor.fetchone()
+        except psycopg2.Error:
+            return None
+        return row[0] if row else None
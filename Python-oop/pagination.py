@@ -0,0 +1,35 @@
+import base64
+import json
+from typing import Any, List, Mapping, Optional
+
+# Page size limits shared by the Flask list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(order: str, key: List[Any]) -> str:
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    payload = json.dumps({'o': order, 'k': key}, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, order: str) -> List[Any]:
+    """Decode an opaque cursor back into the sort key it was created from"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        key = payload['k']
+        cursor_order = payload['o']
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+    if cursor_order != order or not isinstance(key, list):
+        raise ValueError("Cursor does not match the requested order")
+    return key
+
+def get_page_params(args: Mapping[str, str]) -> tuple[int, Optional[str]]:
+    """Parse ?limit=&cursor= query parameters"""
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return min(limit, MAX_PAGE_SIZE), args.get('cursor') or None
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any, TypeVar, Generic
+from typing import Iterator, List, Optional, Dict, Any, TypeVar, Generic
 from models.base_model import BaseModel
 
 T = TypeVar('T', bound=BaseModel)
@@ -21,11 +21,17 @@ class BaseService(ABC, Generic[T]):
     def create(self, **kwargs) -> T:
         """Create a new model instance"""
         try:
-            instance = self._model_class(**kwargs)
+            return self.save(self._build_instance(kwargs))
+        except Exception as e:
+            raise self._handle_error("create", e)
+    
+    def save(self, instance: T) -> T:
+        """Persist an instance that was already built (and validated)"""
+        try:
             instance.save()
             return instance
         except Exception as e:
-            raise self._handle_error("create", e)
+            raise self._handle_error("save", e)
     
     def get_by_id(self, model_id: int) -> Optional[T]:
         """Get model by ID"""
@@ -34,6 +40,13 @@ class BaseService(ABC, Generic[T]):
         except Exception as e:
             raise self._handle_error("get_by_id", e)
     
+    def get_many(self, model_ids: List[int]) -> tuple[List[T], List[int]]:
+        """Get models for many IDs in requested order, plus the IDs that were not found"""
+        try:
+            return self._model_class.get_many(model_ids)
+        except Exception as e:
+            raise self._handle_error("get_many", e)
+    
     def get_all(self) -> List[T]:
         """Get all models"""
         try:
@@ -41,30 +54,39 @@ class BaseService(ABC, Generic[T]):
         except Exception as e:
             raise self._handle_error("get_all", e)
     
+    def page(self, cursor: Optional[str] = None, limit: int = 50,
+             order: str = 'id', as_json: bool = False) -> tuple[List[Any], Optional[str]]:
+        """Get one page of models (or their JSON text) and the cursor for the next page"""
+        try:
+            return self._model_class.page(cursor, limit, order, as_json)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise self._handle_error("page", e)
+    
+    def query(self):
+        """Start a composable query over the service's model"""
+        return self._model_class.query()
+    
+    def iter_all(self, batch_size: int = 2000) -> Iterator[T]:
+        """Stream all models without loading the whole table"""
+        try:
+            yield from self._model_class.iter_all(batch_size)
+        except Exception as e:
+            raise self._handle_error("iter_all", e)
+    
     def update(self, model_id: int, **kwargs) -> Optional[T]:
         """Update model by ID"""
         try:
-            instance = self._model_class.get_by_id(model_id)
-            if not instance:
-                return None
-            
-            # Update attributes
-            for key, value in kwargs.items():
-                if hasattr(instance, key):
-                    setattr(instance, key, value)
-            
-            instance.save()
-            return instance
+            # One UPDATE ... RETURNING instead of SELECT + full-row UPDATE
+            return self._model_class.update_by_id(model_id, kwargs)
         except Exception as e:
             raise self._handle_error("update", e)
     
     def delete(self, model_id: int) -> bool:
         """Delete model by ID"""
         try:
-            instance = self._model_class.get_by_id(model_id)
-            if not instance:
-                return False
-            return instance.delete()
+            return bool(self._model_class.delete_many([model_id]))
         except Exception as e:
             raise self._handle_error("delete", e)
     
@@ -78,27 +100,57 @@ class BaseService(ABC, Generic[T]):
     # Business Logic Methods
     def exists(self, model_id: int) -> bool:
         """Check if model exists"""
-        return self.get_by_id(model_id) is not None
+        try:
+            return self._model_class.query().filter(id=model_id).exists()
+        except Exception as e:
+            raise self._handle_error("exists", e)
     
-    def bulk_create(self, data_list: List[Dict[str, Any]]) -> List[T]:
-        """Create multiple models"""
+    def bulk_create(self, data_list: List[Dict[str, Any]], chunk_size: int = 1000,
+                    errors: Optional[List[Dict[str, Any]]] = None) -> List[T]:
+        """
+        Create multiple models with chunked multi-row INSERTs in one transaction.
+        Rows that fail validation or insertion are skipped; pass an `errors` list
+        to collect them as {'index': ..., 'error': ...} entries.
+        """
         instances = []
-        for data in data_list:
+        positions = []
+        failures = []
+        
+        # Validate the whole batch up front; each row is validated exactly once
+        for index, data in enumerate(data_list):
             try:
-                instance = self.create(**data)
-                instances.append(instance)
+                instances.append(self._build_instance(data))
+                positions.append(index)
             except Exception as e:
+                failures.append((index, e))
+        
+        try:
+            insert_failures = self._model_class.bulk_insert(instances, chunk_size)
+        except Exception as e:
+            raise self._handle_error("bulk_create", e)
+        
+        failed = {index for index, _ in insert_failures}
+        failures.extend((positions[index], e) for index, e in insert_failures)
+        
+        for index, e in sorted(failures, key=lambda failure: failure[0]):
+            if errors is not None:
+                errors.append({'index': index, 'error': str(e)})
+            else:
                 # Log error but continue with other items
-                print(f"Error creating item: {e}")
-        return instances
-    
-    def bulk_delete(self, model_ids: List[int]) -> int:
-        """Delete multiple models"""
-        deleted_count = 0
-        for model_id in model_ids:
-            if self.delete(model_id):
-                deleted_count += 1
-        return deleted_count
+                print(f"Error creating item {index}: {e}")
+        
+        return [instance for index, instance in enumerate(instances) if index not in failed]
+    
+    def bulk_delete(self, model_ids: List[int], chunk_size: int = 10000) -> List[int]:
+        """Delete multiple models; return the IDs that were actually removed"""
+        try:
+            return self._model_class.delete_many(model_ids, chunk_size)
+        except Exception as e:
+            raise self._handle_error("bulk_delete", e)
+    
+    def _build_instance(self, data: Dict[str, Any]) -> T:
+        """Build an unsaved model from a payload; raises ValueError on invalid data"""
+        return self._model_class(**data)
     
     # Abstract methods for subclasses to implement
     @abstractmethod
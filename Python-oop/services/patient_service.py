@@ -1,8 +1,14 @@
-from typing import List, Dict, Any, Optional
-from datetime import datetime, date
-from collections import Counter
+from typing import Iterable, Iterator, List, Dict, Any, Optional
+from datetime import datetime, date, time, timedelta
+from time import monotonic
+import threading
+import zlib
+from db import copy_to_iter
 from services.base_service import BaseService
 from models.patient import Patient
+from models import validation
+from models.validation import ValidationResult, validate_patient_data
+from models.batch_validation import validate_in_batches
 
 class PatientService(BaseService[Patient]):
     """
@@ -13,76 +19,101 @@ class PatientService(BaseService[Patient]):
     - Encapsulation: Private methods for complex operations
     """
     
-    def __init__(self):
-        """Initialize Patient Service"""
+    ANALYTICS_MODES = ('sql', 'frame')
+    
+    def __init__(self, analytics_mode: str = 'sql', frame_ttl: float = 300.0,
+                 frame_min_interval: float = 1.0):
+        """
+        Initialize Patient Service.
+        analytics_mode 'frame' answers the aggregate statistics from a columnar
+        PatientFrame (NumPy) that is reloaded when older than frame_ttl seconds,
+        or sooner when invalidate_frame() is called (the change listener does so on writes),
+        but at most once per frame_min_interval seconds. Patient lists always use the
+        indexed SQL predicates, which are exact and current.
+        """
         super().__init__(Patient)
+        if analytics_mode not in self.ANALYTICS_MODES:
+            raise ValueError(f"Unsupported analytics mode: {analytics_mode}")
+        self._analytics_mode = analytics_mode
+        self._frame_ttl = frame_ttl
+        self._frame_min_interval = frame_min_interval
+        self._frame = None
+        self._frame_loaded_at = 0.0
+        self._frame_stale = False
+        self._frame_lock = threading.Lock()
     
     # Polymorphism: Override base methods with patient-specific logic
     def create(self, **kwargs) -> Patient:
-        """Create a new patient with validation"""
-        if not self.validate_data(kwargs):
-            raise ValueError("Invalid patient data")
-        return super().create(**kwargs)
+        """Create a new patient, validating the payload exactly once"""
+        # ValueError (invalid data) propagates unwrapped; save() errors are wrapped
+        return self.save(self._build_instance(kwargs))
     
     def update(self, patient_id: int, **kwargs) -> Optional[Patient]:
         """Update patient with validation"""
-        if not self.validate_data(kwargs):
-            raise ValueError("Invalid patient data")
-        return super().update(patient_id, **kwargs)
+        result = self.validate(kwargs)
+        if not result.is_valid:
+            raise ValueError(f"Invalid patient data: {result.error_message()}")
+        try:
+            # Already validated as a whole; write it in one UPDATE ... RETURNING
+            return Patient.update_by_id(patient_id, result.data, validated=True)
+        except Exception as e:
+            raise self._handle_error("update", e)
+    
+    def validate(self, data: Dict[str, Any]) -> ValidationResult:
+        """Run the validation pipeline once and return the structured result"""
+        return validate_patient_data(data)
     
     # Abstract method implementations
     def validate_data(self, data: Dict[str, Any]) -> bool:
         """Validate patient data"""
-        required_fields = ['first_name', 'last_name', 'date_of_birth', 'gender', 'contact_number']
-        
-        # Check required fields
-        for field in required_fields:
-            if field not in data or not data[field]:
-                return False
-        
-        # Create temporary patient for validation
-        try:
-            temp_patient = Patient(**data)
-            return temp_patient.validate()
-        except:
-            return False
+        return self.validate(data).is_valid
+    
+    def _build_instance(self, data: Dict[str, Any]) -> Patient:
+        """Validate once and build the patient from the validation result"""
+        return Patient.from_validated(self.validate(data))
     
     def get_statistics(self) -> Dict[str, Any]:
-        """Get patient statistics"""
+        """Get patient statistics (one aggregate query, no per-patient objects)"""
         try:
-            all_patients = self.get_all()
-            
-            # Calculate statistics
-            total_patients = len(all_patients)
-            adults = [p for p in all_patients if p.is_adult()]
-            minors = [p for p in all_patients if not p.is_adult()]
+            if self._analytics_mode == 'frame':
+                return self.get_frame().statistics()
             
-            # Gender distribution
-            gender_counts = Counter(p.gender.lower() for p in all_patients)
+            groups = Patient.get_demographics()
             
-            # Age distribution
-            ages = [p.get_age() for p in all_patients if p.get_age() is not None]
-            avg_age = sum(ages) / len(ages) if ages else 0
+            total_patients = sum(group['total'] for group in groups)
+            adults = sum(group['adults'] for group in groups)
+            aged = sum(group['aged'] for group in groups)
+            age_sum = sum(group['age_sum'] for group in groups)
+            min_ages = [group['min_age'] for group in groups if group['min_age'] is not None]
+            max_ages = [group['max_age'] for group in groups if group['max_age'] is not None]
+            age_groups = {
+                label: sum(group[label] for group in groups)
+                for label in ('Minor', 'Young Adult', 'Adult', 'Middle-aged', 'Senior', 'Unknown')
+            }
             
             return {
                 'total_patients': total_patients,
-                'adults': len(adults),
-                'minors': len(minors),
-                'gender_distribution': dict(gender_counts),
-                'average_age': round(avg_age, 1),
+                'adults': adults,
+                'minors': total_patients - adults,
+                'gender_distribution': {group['gender']: group['total'] for group in groups},
+                'average_age': round(age_sum / aged, 1) if aged else 0,
                 'age_range': {
-                    'min': min(ages) if ages else 0,
-                    'max': max(ages) if ages else 0
-                }
+                    'min': min(min_ages) if min_ages else 0,
+                    'max': max(max_ages) if max_ages else 0
+                },
+                'age_groups': age_groups
             }
         except Exception as e:
             return {'error': str(e)}
     
     # Patient-specific business logic methods
-    def search_by_name(self, name: str) -> List[Patient]:
-        """Search patients by name"""
+    def search_by_name(self, name: str, limit: Optional[int] = None, mode: str = 'like',
+                       as_json: bool = False) -> List[Any]:
+        """Search patients by name (as_json: to_dict() JSON text instead of patients)"""
         try:
-            return Patient.search_by_name(name)
+            return Patient.search_by_name(name, limit, mode, as_json)
+        except ValueError:
+            raise
         except Exception as e:
             raise self._handle_error("search_by_name", e)
     
@@ -103,59 +134,78 @@ class PatientService(BaseService[Patient]):
     def get_minors(self) -> List[Patient]:
         """Get all minor patients"""
         try:
-            all_patients = self.get_all()
-            return [p for p in all_patients if not p.is_adult()]
+            return self.minors_query().all()
         except Exception as e:
             raise self._handle_error("get_minors", e)
     
     def get_by_age_range(self, min_age: int, max_age: int) -> List[Patient]:
         """Get patients within age range"""
         try:
-            all_patients = self.get_all()
-            return [
-                p for p in all_patients 
-                if p.get_age() is not None and min_age <= p.get_age() <= max_age
-            ]
+            if min_age > max_age:
+                return []
+            return self.age_range_query(min_age, max_age).all()
         except Exception as e:
             raise self._handle_error("get_by_age_range", e)
     
     def get_recent_patients(self, days: int = 30) -> List[Patient]:
         """Get patients created in the last N days"""
         try:
-            all_patients = self.get_all()
-            cutoff_date = datetime.now().date() - date.today().replace(day=days)
-            
-            return [
-                p for p in all_patients 
-                if p.created_at and p.created_at.date() >= cutoff_date
-            ]
+            return self.recent_query(days).all()
         except Exception as e:
             raise self._handle_error("get_recent_patients", e)
     
+    # Query builders (lists as models via .all(), or as JSON text via .iter_json())
+    def gender_query(self, gender: str):
+        """Query for patients of a gender"""
+        return Patient.query_by_gender(gender)
+    
+    def adults_query(self):
+        """Query for adult patients"""
+        return Patient.query_adults()
+    
+    def minors_query(self):
+        """Query for minor patients"""
+        return (self.query()
+                .filter(date_of_birth__gt=Patient.latest_birth_date(18))
+                .order_by('id'))
+    
+    def age_range_query(self, min_age: int, max_age: int):
+        """Query for patients with min_age <= age <= max_age"""
+        if min_age > max_age:
+            return self.query().filter(id__in=[]).order_by('id')
+        # min_age <= age <= max_age  <=>  born after the (max_age + 1) cutoff, on or before the min_age one
+        today = date.today()
+        return (self.query()
+                .filter(date_of_birth__lte=Patient.latest_birth_date(min_age, today),
+                        date_of_birth__gt=Patient.latest_birth_date(max_age + 1, today))
+                .order_by('id'))
+    
+    def recent_query(self, days: int = 30):
+        """Query for patients created in the last N days, newest first"""
+        cutoff = datetime.combine(date.today() - timedelta(days=days), time.min)
+        return (self.query()
+                .filter(created_at__gte=cutoff)
+                .order_by('-created_at'))
+    
     def get_duplicate_contacts(self) -> List[List[Patient]]:
         """Find patients with duplicate contact numbers"""
         try:
-            all_patients = self.get_all()
-            contact_groups = {}
-            
-            for patient in all_patients:
-                clean_contact = ''.join(filter(str.isdigit, patient.contact_number))
-                if clean_contact in contact_groups:
-                    contact_groups[clean_contact].append(patient)
-                else:
-                    contact_groups[clean_contact] = [patient]
-            
-            # Return only groups with duplicates
-            return [group for group in contact_groups.values() if len(group) > 1]
+            return Patient.get_duplicate_contact_groups()
         except Exception as e:
             raise self._handle_error("get_duplicate_contacts", e)
     
+    def find_by_contact(self, contact: str) -> List[Patient]:
+        """Find patients by contact number, ignoring formatting"""
+        try:
+            return Patient.find_by_contact(contact)
+        except Exception as e:
+            raise self._handle_error("find_by_contact", e)
+    
     def get_patients_without_contact(self) -> List[Patient]:
         """Get patients with invalid or missing contact numbers"""
         try:
-            all_patients = self.get_all()
             return [
-                p for p in all_patients 
+                p for p in self.iter_all() 
                 if not p._validate_contact(p.contact_number)
             ]
         except Exception as e:
@@ -164,29 +214,44 @@ class PatientService(BaseService[Patient]):
     def export_to_csv_format(self) -> List[Dict[str, Any]]:
         """Export patients to CSV format"""
         try:
-            all_patients = self.get_all()
-            csv_data = []
-            
-            for patient in all_patients:
-                csv_data.append({
-                    'ID': patient.id,
-                    'First Name': patient.first_name,
-                    'Last Name': patient.last_name,
-                    'Full Name': patient.get_full_name(),
-                    'Date of Birth': patient.date_of_birth,
-                    'Age': patient.get_age(),
-                    'Gender': patient.gender,
-                    'Contact Number': patient.contact_number,
-                    'Formatted Contact': patient.get_formatted_contact(),
-                    'Is Adult': patient.is_adult(),
-                    'Created At': str(patient.created_at) if patient.created_at else '',
-                    'Updated At': str(patient.updated_at) if patient.updated_at else ''
-                })
-            
-            return csv_data
+            return list(self.iter_csv_rows())
         except Exception as e:
             raise self._handle_error("export_to_csv_format", e)
     
+    def stream_csv(self, compress: bool = False) -> Iterator[bytes]:
+        """Stream the CSV export (header included) straight from COPY TO STDOUT, optionally gzipped"""
+        sql = f"COPY ({Patient.csv_export_sql()}) TO STDOUT WITH (FORMAT csv, HEADER)"
+        chunks = copy_to_iter(sql)
+        if not compress:
+            yield from chunks
+            return
+        
+        # wbits=31 writes a gzip container
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+    
+    def iter_csv_rows(self) -> Iterator[Dict[str, Any]]:
+        """Stream patients as CSV-ready rows"""
+        for patient in self.iter_all():
+            yield {
+                'ID': patient.id,
+                'First Name': patient.first_name,
+                'Last Name': patient.last_name,
+                'Full Name': patient.get_full_name(),
+                'Date of Birth': patient.date_of_birth,
+                'Age': patient.get_age(),
+                'Gender': patient.gender,
+                'Contact Number': patient.contact_number,
+                'Formatted Contact': patient.get_formatted_contact(),
+                'Is Adult': patient.is_adult(),
+                'Created At': str(patient.created_at) if patient.created_at else '',
+                'Updated At': str(patient.updated_at) if patient.updated_at else ''
+            }
+    
     def get_patient_summary(self, patient_id: int) -> Optional[Dict[str, Any]]:
         """Get detailed patient summary"""
         try:
@@ -194,28 +259,102 @@ class PatientService(BaseService[Patient]):
             if not patient:
                 return None
             
-            return {
-                'basic_info': {
-                    'id': patient.id,
-                    'full_name': patient.get_full_name(),
-                    'age': patient.get_age(),
-                    'gender': patient.gender,
-                    'contact': patient.get_formatted_contact()
-                },
-                'demographics': {
-                    'is_adult': patient.is_adult(),
-                    'age_group': self._get_age_group(patient.get_age()),
-                    'contact_valid': patient._validate_contact(patient.contact_number)
-                },
-                'timestamps': {
-                    'created_at': str(patient.created_at) if patient.created_at else None,
-                    'updated_at': str(patient.updated_at) if patient.updated_at else None
-                }
-            }
+            return self._build_summary(patient)
         except Exception as e:
             raise self._handle_error("get_patient_summary", e)
     
+    def get_patient_summaries(self, patient_ids: List[int]) -> tuple[List[Dict[str, Any]], List[int]]:
+        """Get summaries for many patients with batched lookups; returns (summaries, missing IDs)"""
+        try:
+            patients, missing = Patient.get_many(patient_ids)
+            return [self._build_summary(patient) for patient in patients], missing
+        except Exception as e:
+            raise self._handle_error("get_patient_summaries", e)
+    
+    # Large imports
+    def import_rows(self, rows: Iterable[Any], chunk_size: int = 5000, workers: Optional[int] = None,
+                    rejects: Optional[List[Dict[str, Any]]] = None, start_row: int = 1) -> int:
+        """
+        Validate raw import rows across a process pool and bulk insert the accepted ones,
+        one chunk at a time. Returns the number of patients inserted; pass a `rejects`
+        list to collect {'row': ..., 'field': ..., 'reason': ...} entries in input order.
+        """
+        inserted = 0
+        try:
+            for chunk in validate_in_batches(rows, chunk_size, workers, start_row):
+                patients = [Patient.from_validated(result) for _, result in chunk.results()]
+                failures = Patient.bulk_insert(patients, chunk_size)
+                inserted += len(patients) - len(failures)
+                
+                if rejects is not None:
+                    chunk_rejects = [
+                        {'row': reject.row_number, 'field': reject.field, 'reason': reject.reason}
+                        for reject in chunk.rejects
+                    ]
+                    chunk_rejects.extend(
+                        {'row': chunk.accepted[index][0], 'field': None, 'reason': str(e)}
+                        for index, e in failures
+                    )
+                    chunk_rejects.sort(key=lambda reject: reject['row'])
+                    rejects.extend(chunk_rejects)
+        except Exception as e:
+            raise self._handle_error("import_rows", e)
+        return inserted
+    
+    # Columnar analytics
+    def get_frame(self, refresh: bool = False):
+        """Get the columnar PatientFrame, reloading it when stale (one loader at a time)"""
+        # Imported lazily so NumPy is only needed when frames are used
+        from models.patient_frame import PatientFrame
+        
+        frame = self._frame
+        if not refresh and frame is not None and not self._frame_due():
+            return frame
+        # While another thread reloads, callers that have a frame keep using it
+        if not self._frame_lock.acquire(blocking=refresh or frame is None):
+            return frame
+        try:
+            if refresh or self._frame is None or self._frame_due():
+                # Cleared first: an invalidation arriving during the load schedules another one
+                self._frame_stale = False
+                self._frame = PatientFrame.from_db()
+                self._frame_loaded_at = monotonic()
+            return self._frame
+        finally:
+            self._frame_lock.release()
+    
+    def invalidate_frame(self, *_):
+        """Mark the cached PatientFrame stale so get_frame() reloads it soon"""
+        self._frame_stale = True
+    
     # Private helper methods (Encapsulation)
+    def _frame_due(self) -> bool:
+        """Whether the frame has expired, or was invalidated and the rebuild interval has passed"""
+        age = monotonic() - self._frame_loaded_at
+        return age > self._frame_ttl or (self._frame_stale and age >= self._frame_min_interval)
+    
+    def _build_summary(self, patient: Patient) -> Dict[str, Any]:
+        """Build the summary document for one patient"""
+        age = patient.get_age()
+        return {
+            'basic_info': {
+                'id': patient.id,
+                'full_name': patient.get_full_name(),
+                'age': age,
+                'gender': patient.gender,
+                'contact': patient.get_formatted_contact()
+            },
+            'demographics': {
+                'is_adult': patient.is_adult(),
+                'age_group': self._get_age_group(age),
+                'contact_valid': patient._validate_contact(patient.contact_number)
+            },
+            'timestamps': {
+                'created_at': str(patient.created_at) if patient.created_at else None,
+                'updated_at': str(patient.updated_at) if patient.updated_at else None
+            }
+        }
+    
     def _get_age_group(self, age: Optional[int]) -> str:
         """Get age group category"""
         if age is None:
@@ -233,10 +372,7 @@ class PatientService(BaseService[Patient]):
     
     def _validate_contact_format(self, contact: str) -> bool:
         """Validate contact number format"""
-        import re
-        # Remove all non-digit characters
-        digits_only = re.sub(r'\D', '', contact)
-        return 7 <= len(digits_only) <= 15
+        return validation.is_valid_contact_digits(validation.normalize_contact(contact))
     
     # Magic methods for better object representation
     def __str__(self) -> str:
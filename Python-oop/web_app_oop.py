@@ -1,49 +1,176 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, make_response, render_template, request, jsonify, stream_with_context
+from functools import wraps
+import hashlib
+import json
 import os
-from datetime import datetime
-from db import get_connection
+from datetime import date, datetime
+from migrations import run_migrations
+from db import connection, reset_routing, routing_stats, statement_cache_stats
+from pagination import get_page_params
 
 # Import OOP components
-from models.patient import Patient
+from models.base_model import BaseModel
+from models.change_listener import ChangeListener
+from models.patient import Patient, NAME_SEARCH_EXPRESSION
 from services.patient_service import PatientService
 from factories.model_factory import get_patient_factory, get_factory_registry
 
 app = Flask(__name__)
 
 # Initialize services and factories (Dependency Injection)
-patient_service = PatientService()
+patient_service = PatientService(
+    analytics_mode=os.getenv('PATIENT_ANALYTICS_MODE', 'sql'),
+    frame_ttl=float(os.getenv('PATIENT_FRAME_TTL', '300')),
+    frame_min_interval=float(os.getenv('PATIENT_FRAME_MIN_INTERVAL', '1'))
+)
 patient_factory = get_patient_factory()
 factory_registry = get_factory_registry()
 
+# Upper bound on ids accepted by the batch summary endpoint
+MAX_SUMMARY_IDS = 1000
+
+# Seconds between re-reads of the table_versions row behind ETags
+BaseModel.data_versions().refresh_interval = float(os.getenv('DATA_VERSION_REFRESH', '2'))
+
+# Cross-worker invalidation: triggers NOTIFY row changes, each worker drops stale cache entries.
+# On by default whenever this process keeps caches (identity map or frame analytics);
+# an empty CHANGE_LISTENER= (as copied from env_template.txt) counts as unset.
+change_listener = ChangeListener(channel=os.getenv('CHANGE_CHANNEL') or 'table_changes')
+change_listener.subscribe('patients', patient_service.invalidate_frame)
+CHANGE_LISTENER_ENABLED = (os.getenv('CHANGE_LISTENER') or (
+    '1' if int(os.getenv('MODEL_CACHE_SIZE', '0')) > 0 or os.getenv('PATIENT_ANALYTICS_MODE') == 'frame' else '0'
+)) == '1'
+
+@app.before_request
+def start_change_listener():
+    """Start this worker's change listener on its first request (after any fork)"""
+    if CHANGE_LISTENER_ENABLED:
+        change_listener.start()
+
+@app.before_request
+def reset_replica_routing():
+    """Let each request read from replicas until it writes (read-your-writes within a request)"""
+    reset_routing()
+
+def conditional_get(model_class):
+    """
+    Serve GET requests with an ETag derived from model_class's table version and the
+    request URL; a matching If-None-Match gets a 304 without running the view
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            try:
+                version = model_class.data_version()
+            except Exception:
+                version = None
+            if version is None:
+                # No database version (e.g. migrations not applied): never tag, never 304
+                return view(*args, **kwargs)
+            
+            # Ages change with the date, so it is part of every tag
+            key = f"{version}|{date.today().isoformat()}|{request.full_path}"
+            etag = hashlib.sha1(key.encode()).hexdigest()
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+            
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                # Let clients keep the body but revalidate every time
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+# Rows per chunk written by streamed JSON list responses
+JSON_CHUNK_ROWS = int(os.getenv('JSON_CHUNK_ROWS', '500'))
+
+def json_array_response(rows, chunk_rows: int = JSON_CHUNK_ROWS) -> Response:
+    """Stream JSON text rows (rendered by Postgres) as one JSON array, chunk by chunk"""
+    rows = iter(rows)
+    # Run the query now so database errors still become a JSON 500 response
+    first = next(rows, None)
+    
+    def generate():
+        yield '['
+        if first is not None:
+            separator = ''
+            batch = [first]
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunk_rows:
+                    yield separator + ','.join(batch)
+                    separator = ','
+                    batch = []
+            if batch:
+                yield separator + ','.join(batch)
+        yield ']'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+# Opt-in identity map for get_by_id (MODEL_CACHE_SIZE=0 disables it)
+if int(os.getenv('MODEL_CACHE_SIZE', '0')) > 0:
+    BaseModel.enable_cache(
+        max_size=int(os.getenv('MODEL_CACHE_SIZE')),
+        ttl=float(os.getenv('MODEL_CACHE_TTL', '60'))
+    )
+
 def init_db():
     """Initialize database with enhanced schema"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
+        with connection() as conn:
+            cursor = conn.cursor()
+            
+            # Create patients table with additional columns for OOP features
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS patients (
+                    id SERIAL PRIMARY KEY,
+                    first_name VARCHAR(100) NOT NULL,
+                    last_name VARCHAR(100) NOT NULL,
+                    date_of_birth DATE NOT NULL,
+                    gender VARCHAR(20) NOT NULL,
+                    contact_number VARCHAR(20) NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Keyset index for name-ordered pages
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_patients_name_keyset
+                ON patients (last_name, first_name, id)
+            ''')
+            
+            # Trigram index for name search; optional when pg_trgm cannot be installed
+            cursor.execute('SAVEPOINT pg_trgm')
+            try:
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+                cursor.execute(f'''
+                    CREATE INDEX IF NOT EXISTS idx_patients_name_trgm
+                    ON patients USING gin (({NAME_SEARCH_EXPRESSION}) gin_trgm_ops)
+                ''')
+                cursor.execute('RELEASE SAVEPOINT pg_trgm')
+            except Exception as e:
+                cursor.execute('ROLLBACK TO SAVEPOINT pg_trgm')
+                print(f"⚠️ pg_trgm unavailable, name search will use LIKE: {e}")
+            
+            # B-tree indexes for age (birth date) and recency range scans
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_patients_date_of_birth ON patients (date_of_birth)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_patients_created_at ON patients (created_at)')
         
-        # Create patients table with additional columns for OOP features
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS patients (
-                id SERIAL PRIMARY KEY,
-                first_name VARCHAR(100) NOT NULL,
-                last_name VARCHAR(100) NOT NULL,
-                date_of_birth DATE NOT NULL,
-                gender VARCHAR(20) NOT NULL,
-                contact_number VARCHAR(20) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        # contact_digits, table versions, change notifications (also: python migrations.py)
+        run_migrations()
         
-        conn.commit()
         print("✅ OOP-enhanced database initialized successfully!")
         return True
     except Exception as e:
         print(f"❌ Error initializing database: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 @app.route('/')
 def index():
@@ -52,11 +179,18 @@ def index():
 
 # API Routes demonstrating OOP concepts
 @app.route('/api/patients', methods=['GET'])
+@conditional_get(Patient)
 def get_patients():
-    """Get all patients using service layer"""
+    """Get one page of patients using service layer (?limit=&cursor=&order=id|name)"""
     try:
-        patients = patient_service.get_all()
-        return jsonify([patient.to_dict() for patient in patients])
+        limit, cursor = get_page_params(request.args)
+        order = request.args.get('order', 'id')
+        # Rows arrive as JSON text; no Patient objects are built for the page
+        rows, next_cursor = patient_service.page(cursor, limit, order, as_json=True)
+        body = f'{{"patients":[{",".join(rows)}],"next_cursor":{json.dumps(next_cursor)},"limit":{limit}}}'
+        return Response(body, mimetype='application/json')
+    except ValueError as e:
+        return jsonify({'error': f'Invalid page request: {str(e)}'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -66,11 +200,11 @@ def create_patient():
     try:
         data = request.json
         
-        # Use factory pattern to create patient
+        # Use factory pattern to create patient (the payload is validated once here)
         patient = patient_factory.create_patient_with_validation(**data)
         
-        # Use service layer to save patient
-        patient_service.create(**data)
+        # Use service layer to save the already validated patient
+        patient_service.save(patient)
         
         return jsonify(patient.to_dict()), 201
     except ValueError as e:
@@ -79,6 +213,7 @@ def create_patient():
         return jsonify({'error': f'Error creating patient: {str(e)}'}), 500
 
 @app.route('/api/patients/<int:patient_id>', methods=['GET'])
+@conditional_get(Patient)
 def get_patient(patient_id):
     """Get patient by ID using service layer"""
     try:
@@ -115,60 +250,66 @@ def delete_patient(patient_id):
 
 # Advanced OOP Features API Routes
 @app.route('/api/patients/search/<name>', methods=['GET'])
+@conditional_get(Patient)
 def search_patients(name):
-    """Search patients by name using service layer"""
+    """Search patients by name using service layer (?limit=&mode=like|trigram|auto)"""
     try:
-        patients = patient_service.search_by_name(name)
-        return jsonify([patient.to_dict() for patient in patients])
+        # Every match unless ?limit= is given; fuzzy trigram matching is opt-in via ?mode=
+        limit = get_page_params(request.args)[0] if 'limit' in request.args else None
+        mode = request.args.get('mode', 'like')
+        return json_array_response(patient_service.search_by_name(name, limit, mode, as_json=True))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid search request: {str(e)}'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/patients/gender/<gender>', methods=['GET'])
+@conditional_get(Patient)
 def get_patients_by_gender(gender):
     """Get patients by gender using service layer"""
     try:
-        patients = patient_service.get_by_gender(gender)
-        return jsonify([patient.to_dict() for patient in patients])
+        return json_array_response(patient_service.gender_query(gender).iter_json())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/patients/adults', methods=['GET'])
+@conditional_get(Patient)
 def get_adult_patients():
     """Get adult patients using service layer"""
     try:
-        patients = patient_service.get_adults()
-        return jsonify([patient.to_dict() for patient in patients])
+        return json_array_response(patient_service.adults_query().iter_json())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/patients/minors', methods=['GET'])
+@conditional_get(Patient)
 def get_minor_patients():
     """Get minor patients using service layer"""
     try:
-        patients = patient_service.get_minors()
-        return jsonify([patient.to_dict() for patient in patients])
+        return json_array_response(patient_service.minors_query().iter_json())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/patients/age-range/<int:min_age>/<int:max_age>', methods=['GET'])
+@conditional_get(Patient)
 def get_patients_by_age_range(min_age, max_age):
     """Get patients by age range using service layer"""
     try:
-        patients = patient_service.get_by_age_range(min_age, max_age)
-        return jsonify([patient.to_dict() for patient in patients])
+        return json_array_response(patient_service.age_range_query(min_age, max_age).iter_json())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/patients/recent/<int:days>', methods=['GET'])
+@conditional_get(Patient)
 def get_recent_patients(days):
     """Get recent patients using service layer"""
     try:
-        patients = patient_service.get_recent_patients(days)
-        return jsonify([patient.to_dict() for patient in patients])
+        return json_array_response(patient_service.recent_query(days).iter_json())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/patients/duplicates', methods=['GET'])
+@conditional_get(Patient)
 def get_duplicate_contacts():
     """Get patients with duplicate contacts using service layer"""
     try:
@@ -180,7 +321,18 @@ def get_duplicate_contacts():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/patients/contact/<contact>', methods=['GET'])
+@conditional_get(Patient)
+def get_patients_by_contact(contact):
+    """Get patients by exact contact number (any formatting) using service layer"""
+    try:
+        patients = patient_service.find_by_contact(contact)
+        return jsonify([patient.to_dict() for patient in patients])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/patients/invalid-contacts', methods=['GET'])
+@conditional_get(Patient)
 def get_patients_without_contact():
     """Get patients with invalid contacts using service layer"""
     try:
@@ -189,7 +341,33 @@ def get_patients_without_contact():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/patients/summary', methods=['GET', 'POST'])
+@conditional_get(Patient)
+def get_patient_summaries():
+    """Get summaries for many patients at once (GET ?ids=1,2,3 or POST {"ids": [...]})"""
+    try:
+        if request.method == 'POST':
+            ids = (request.get_json(silent=True) or {}).get('ids')
+        else:
+            ids = [part for part in request.args.get('ids', '').split(',') if part.strip()]
+        if not isinstance(ids, list):
+            raise ValueError("ids must be a list of patient IDs")
+        if len(ids) > MAX_SUMMARY_IDS:
+            raise ValueError(f"At most {MAX_SUMMARY_IDS} ids per request")
+        try:
+            patient_ids = [int(patient_id) for patient_id in ids]
+        except (TypeError, ValueError):
+            raise ValueError("ids must be integers")
+        
+        summaries, missing = patient_service.get_patient_summaries(patient_ids)
+        return jsonify({'summaries': summaries, 'missing': missing})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/patients/<int:patient_id>/summary', methods=['GET'])
+@conditional_get(Patient)
 def get_patient_summary(patient_id):
     """Get detailed patient summary using service layer"""
     try:
@@ -201,6 +379,7 @@ def get_patient_summary(patient_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/statistics', methods=['GET'])
+@conditional_get(Patient)
 def get_statistics():
     """Get patient statistics using service layer"""
     try:
@@ -211,10 +390,23 @@ def get_statistics():
 
 @app.route('/api/export/csv', methods=['GET'])
 def export_to_csv():
-    """Export patients to CSV format using service layer"""
+    """Stream all patients as a CSV download (?gzip=1 for patients.csv.gz)"""
     try:
-        csv_data = patient_service.export_to_csv_format()
-        return jsonify(csv_data)
+        compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+        chunks = patient_service.stream_csv(compress)
+        # Start the COPY now so database errors still become a JSON 500 response
+        first = next(chunks, b'')
+        
+        def generate():
+            yield first
+            yield from chunks
+        
+        filename = 'patients.csv.gz' if compress else 'patients.csv'
+        return Response(
+            stream_with_context(generate()),
+            mimetype='application/gzip' if compress else 'text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -327,22 +519,20 @@ def oop_demo():
 def status():
     """Check application and database status"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Check database connection
-        cursor.execute('SELECT version()')
-        version = cursor.fetchone()[0]
-        
-        # Check patients table
-        cursor.execute('SELECT COUNT(*) FROM patients')
-        patient_count = cursor.fetchone()[0]
-        
-        # Get database info
-        cursor.execute('SELECT current_database(), current_user')
-        db_info = cursor.fetchone()
-        
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            
+            # Check database connection
+            cursor.execute('SELECT version()')
+            version = cursor.fetchone()[0]
+            
+            # Check patients table
+            cursor.execute('SELECT COUNT(*) FROM patients')
+            patient_count = cursor.fetchone()[0]
+            
+            # Get database info
+            cursor.execute('SELECT current_database(), current_user')
+            db_info = cursor.fetchone()
         
         return jsonify({
             'status': 'operational',
@@ -352,6 +542,10 @@ def status():
                 'version': version,
                 'patient_count': patient_count
             },
+            'model_cache': BaseModel.cache_stats(),
+            'statement_cache': statement_cache_stats(),
+            'change_listener': change_listener.stats(),
+            'replicas': routing_stats(),
             'oop_architecture': {
                 'models': 'BaseModel (Abstract) -> Patient (Concrete)',
                 'services': 'BaseService (Abstract) -> PatientService (Concrete)',
@@ -372,11 +566,10 @@ if __name__ == '__main__':
     # Test database connection
     print("🔍 Testing database connection...")
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT version()')
-        version = cursor.fetchone()[0]
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT version()')
+            version = cursor.fetchone()[0]
         print(f"✅ Database connected: {version}")
     except Exception as e:
         print(f"❌ Database connection failed: {e}")
@@ -2,38 +2,35 @@ from flask import Flask, render_template, request, jsonify, redirect, url_for
 import json
 from datetime import datetime
 import os
-from db import get_connection
+from db import connection
+from pagination import encode_cursor, decode_cursor, get_page_params
 
 app = Flask(__name__)
 
 def init_db():
     """Initialize the database with the patients table"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Create patients table if it doesn't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS patients (
-                id SERIAL PRIMARY KEY,
-                first_name VARCHAR(100) NOT NULL,
-                last_name VARCHAR(100) NOT NULL,
-                date_of_birth DATE NOT NULL,
-                gender VARCHAR(20) NOT NULL,
-                contact_number VARCHAR(20) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        with connection() as conn:
+            cursor = conn.cursor()
+            
+            # Create patients table if it doesn't exist
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS patients (
+                    id SERIAL PRIMARY KEY,
+                    first_name VARCHAR(100) NOT NULL,
+                    last_name VARCHAR(100) NOT NULL,
+                    date_of_birth DATE NOT NULL,
+                    gender VARCHAR(20) NOT NULL,
+                    contact_number VARCHAR(20) NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
         
-        conn.commit()
         print("✅ PostgreSQL table 'patients' created successfully!")
         return True
     except Exception as e:
         print(f"❌ Error creating table: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 class Patient:
     def __init__(self, first_name, last_name, date_of_birth, gender, contact_number, id=None, created_at=None):
@@ -59,39 +56,32 @@ class Patient:
     def save(self):
         """Save patient to PostgreSQL database"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO patients (first_name, last_name, date_of_birth, gender, contact_number)
-                VALUES (%s, %s, %s, %s, %s) RETURNING id, created_at
-            ''', (self.first_name, self.last_name, self.date_of_birth, self.gender, self.contact_number))
+            with connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('''
+                    INSERT INTO patients (first_name, last_name, date_of_birth, gender, contact_number)
+                    VALUES (%s, %s, %s, %s, %s) RETURNING id, created_at
+                ''', (self.first_name, self.last_name, self.date_of_birth, self.gender, self.contact_number))
+                
+                result = cursor.fetchone()
+                self.id = result[0]
+                self.created_at = result[1]
             
-            result = cursor.fetchone()
-            self.id = result[0]
-            self.created_at = result[1]
-            
-            conn.commit()
             print(f"✅ Patient saved with ID: {self.id}")
             return self
         except Exception as e:
             print(f"❌ Error saving patient: {e}")
-            if conn:
-                conn.rollback()
             raise e
-        finally:
-            if conn:
-                conn.close()
 
     @staticmethod
     def get_by_id(patient_id):
         """Get patient by ID from PostgreSQL database"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM patients WHERE id = %s', (patient_id,))
-            row = cursor.fetchone()
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM patients WHERE id = %s', (patient_id,))
+                row = cursor.fetchone()
             
             if row:
                 return Patient(
@@ -107,51 +97,43 @@ class Patient:
         except Exception as e:
             print(f"❌ Error getting patient by ID: {e}")
             return None
-        finally:
-            if conn:
-                conn.close()
 
     def update(self, **kwargs):
         """Update patient in PostgreSQL database"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
             # Build dynamic update query
             update_fields = []
             values = []
             for field, value in kwargs.items():
                 if hasattr(self, field) and value is not None:
+                    # Only write columns whose value actually changed
+                    current = getattr(self, field)
+                    if value == current or (current is not None and value == str(current)):
+                        continue
                     update_fields.append(f"{field} = %s")
                     values.append(value)
                     setattr(self, field, value)
             
+            # Nothing changed: skip the round trip
             if update_fields:
                 values.append(self.id)
                 query = f"UPDATE patients SET {', '.join(update_fields)} WHERE id = %s"
-                cursor.execute(query, values)
-                conn.commit()
+                with connection() as conn:
+                    conn.cursor().execute(query, values)
                 print(f"✅ Patient {self.id} updated successfully")
             
             return self
         except Exception as e:
             print(f"❌ Error updating patient: {e}")
-            if conn:
-                conn.rollback()
             raise e
-        finally:
-            if conn:
-                conn.close()
 
     def delete(self):
         """Delete patient from PostgreSQL database"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('DELETE FROM patients WHERE id = %s', (self.id,))
-            deleted = cursor.rowcount > 0
-            conn.commit()
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM patients WHERE id = %s', (self.id,))
+                deleted = cursor.rowcount > 0
             
             if deleted:
                 print(f"✅ Patient {self.id} deleted successfully")
@@ -161,22 +143,16 @@ class Patient:
             return deleted
         except Exception as e:
             print(f"❌ Error deleting patient: {e}")
-            if conn:
-                conn.rollback()
             return False
-        finally:
-            if conn:
-                conn.close()
 
     @staticmethod
     def get_all():
         """Get all patients from PostgreSQL database"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM patients ORDER BY id')
-            rows = cursor.fetchall()
+            with connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM patients ORDER BY id')
+                rows = cursor.fetchall()
             
             patients = []
             for row in rows:
@@ -195,9 +171,33 @@ class Patient:
         except Exception as e:
             print(f"❌ Error getting all patients: {e}")
             return []
-        finally:
-            if conn:
-                conn.close()
+
+    @staticmethod
+    def page(after_id=None, limit=50):
+        """Get one page of patients after the given ID (keyset pagination on the primary key)"""
+        with connection() as conn:
+            cursor = conn.cursor()
+            if after_id is None:
+                cursor.execute('SELECT * FROM patients ORDER BY id LIMIT %s', (limit + 1,))
+            else:
+                cursor.execute('SELECT * FROM patients WHERE id > %s ORDER BY id LIMIT %s',
+                               (after_id, limit + 1))
+            rows = cursor.fetchall()
+        
+        patients = [
+            Patient(
+                first_name=row[1],
+                last_name=row[2],
+                date_of_birth=row[3],
+                gender=row[4],
+                contact_number=row[5],
+                id=row[0],
+                created_at=row[6]
+            )
+            for row in rows[:limit]
+        ]
+        next_cursor = encode_cursor('id', [patients[-1].id]) if len(rows) > limit else None
+        return patients, next_cursor
 
 @app.route('/')
 def index():
@@ -205,8 +205,23 @@ def index():
 
 @app.route('/api/patients', methods=['GET'])
 def get_patients():
-    patients = [patient.to_dict() for patient in Patient.get_all()]
-    return jsonify(patients)
+    try:
+        limit, cursor = get_page_params(request.args)
+        after_id = decode_cursor(cursor, 'id')[0] if cursor else None
+        if after_id is not None and not isinstance(after_id, int):
+            raise ValueError("Invalid cursor")
+    except ValueError as e:
+        return jsonify({'error': f'Invalid page request: {str(e)}'}), 400
+    
+    try:
+        patients, next_cursor = Patient.page(after_id, limit)
+    except Exception as e:
+        return jsonify({'error': f'Failed to load patients: {str(e)}'}), 500
+    return jsonify({
+        'patients': [patient.to_dict() for patient in patients],
+        'next_cursor': next_cursor,
+        'limit': limit
+    })
 
 @app.route('/api/patients', methods=['POST'])
 def create_patient():
@@ -268,29 +283,27 @@ def delete_patient(patient_id):
 def status():
     """Check PostgreSQL database status"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Check if table exists
-        cursor.execute('''
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables 
-                WHERE table_name = 'patients'
-            )
-        ''')
-        table_exists = cursor.fetchone()[0]
-        
-        if table_exists:
-            cursor.execute('SELECT COUNT(*) FROM patients')
-            count = cursor.fetchone()[0]
-        else:
-            count = 0
-        
-        # Get database info
-        cursor.execute('SELECT current_database(), current_user')
-        db_info = cursor.fetchone()
-        
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            
+            # Check if table exists
+            cursor.execute('''
+                SELECT EXISTS (
+                    SELECT FROM information_schema.tables 
+                    WHERE table_name = 'patients'
+                )
+            ''')
+            table_exists = cursor.fetchone()[0]
+            
+            if table_exists:
+                cursor.execute('SELECT COUNT(*) FROM patients')
+                count = cursor.fetchone()[0]
+            else:
+                count = 0
+            
+            # Get database info
+            cursor.execute('SELECT current_database(), current_user')
+            db_info = cursor.fetchone()
         
         return jsonify({
             'status': 'connected',
@@ -309,11 +322,10 @@ def status():
 def test_connection():
     """Test PostgreSQL connection"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT version()')
-        version = cursor.fetchone()[0]
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT version()')
+            version = cursor.fetchone()[0]
         
         return jsonify({
             'status': 'success',
@@ -332,11 +344,10 @@ if __name__ == '__main__':
     # Test database connection first
     print("🔍 Testing PostgreSQL connection...")
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT version()')
-        version = cursor.fetchone()[0]
-        conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT version()')
+            version = cursor.fetchone()[0]
         print(f"✅ PostgreSQL connected successfully!")
         print(f"📊 Database version: {version}")
     except Exception as e: